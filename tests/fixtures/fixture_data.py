@@ -45,3 +45,11 @@ def few_posts_with_group(mixer, user, group):
 def another_few_posts_with_group_with_follower(mixer, user, another_user, group):
     mixer.blend('posts.Follow', user=user, author=another_user)
     mixer.cycle(20).blend(Post, author=another_user, group=group)
+
+
+@pytest.fixture
+def seeded_content():
+    """Случайные пользователи, группы, посты, комментарии и подписки
+    генератора posts.bench.seed (тот же, что у команды seed_data)."""
+    from posts.bench import seed
+    seed(users=10, groups=3, posts=45, comments=30, follows=20)
@@ -51,3 +51,11 @@ class TestGroupPaginatorView:
             'Проверьте, что переменная `paginator` объекта `page_obj`'
             ' на странице `/profile/<username>/` типа `Paginator`'
         )
+
+    def test_index_paginator_seeded(self, client, seeded_content):
+        cache.clear()
+        response = client.get('/?page=5')
+        page = response.context['page_obj']
+        assert page.paginator.num_pages == 5 and len(page) == 5, (
+            'Проверьте, что на странице `/` по 10 постов на странице'
+        )
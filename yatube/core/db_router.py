@@ -0,0 +1,58 @@
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Чтение из реплики: представления только для чтения (REPLICA_VIEWS)
+# выполняются внутри use_replica(), и роутер отправляет их выборки
+# в базу REPLICA_ALIAS. Запись и чтение внутри транзакции идут в
+# основную базу. Клиент, который только что что-то записал, несколько
+# секунд читает из основной базы (см. core.middleware), чтобы увидеть
+# свои изменения до того, как они дойдут до реплики.
+
+REPLICA_ALIAS = 'replica'
+
+_state = threading.local()
+
+
+def set_replica_reads(enabled):
+    """Включает или выключает чтение из реплики в текущем потоке."""
+    _state.replica = enabled
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """Выборки внутри блока идут в реплику."""
+    previous = getattr(_state, 'replica', False)
+    set_replica_reads(enabled)
+    try:
+        yield
+    finally:
+        set_replica_reads(previous)
+
+
+def reading_from_replica():
+    return (
+        getattr(_state, 'replica', False)
+        and settings.REPLICA_READS
+        and REPLICA_ALIAS in connections.databases
+        and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+    )
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if reading_from_replica():
+            return REPLICA_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика - копия основной базы, объекты из обеих совместимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
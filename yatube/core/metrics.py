@@ -0,0 +1,172 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Замеры запроса: время SQL, шаблонов, миниатюр и обращения к кешу
+# карточек копятся в состоянии текущего потока, которое открывает
+# RequestMetricsMiddleware. Итоги по представлениям собираются в
+# памяти процесса и отдаются в текстовом формате Prometheus.
+
+# Границы гистограммы длительности запроса, секунды
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+# Счётчики запроса и их описания для Prometheus
+COUNTERS = {
+    'sql_queries': 'SQL-запросы',
+    'sql_seconds': 'Время SQL-запросов',
+    'template_seconds': 'Время отрисовки шаблонов',
+    'cache_hits': 'Попадания в кеш карточек',
+    'cache_misses': 'Промахи кеша карточек',
+    'thumbnail_seconds': 'Время создания миниатюр',
+    'prefetch_pages': 'Страницы лент, подготовленные заранее',
+    'prefetch_hits': 'Показы заранее подготовленных страниц лент',
+    'prefetch_seconds': 'Время подготовки страниц лент',
+}
+
+_local = threading.local()
+_totals = defaultdict(lambda: defaultdict(float))
+_buckets = defaultdict(lambda: [0] * (len(DURATION_BUCKETS) + 1))
+_lock = threading.Lock()
+
+
+class RequestMetrics:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.values = defaultdict(float)
+        self.started = time.perf_counter()
+        self.template_depth = 0
+
+    @property
+    def duration(self):
+        return time.perf_counter() - self.started
+
+
+def start():
+    _local.metrics = RequestMetrics()
+    return _local.metrics
+
+
+def finish():
+    return _local.__dict__.pop('metrics', None)
+
+
+def current():
+    """Замеры текущего запроса или None вне запроса."""
+    return getattr(_local, 'metrics', None)
+
+
+def add(name, value=1):
+    """Добавляет value к счётчику name текущего запроса."""
+    metrics = current()
+    if metrics is not None:
+        metrics.values[name] += value
+
+
+@contextmanager
+def timer(name):
+    """Добавляет время блока к счётчику name текущего запроса."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter() - started)
+
+
+@contextmanager
+def template_timer():
+    """Время отрисовки шаблонов без двойного учёта вложенных."""
+    metrics = current()
+    if metrics is None:
+        yield
+        return
+    metrics.template_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.template_depth -= 1
+        if not metrics.template_depth:
+            metrics.values['template_seconds'] += (
+                time.perf_counter() - started)
+
+
+def record_background(name, value):
+    """Замер вне запроса (например, в пуле миниатюр)."""
+    with _lock:
+        _totals['background'][name] += value
+
+
+def record_request(view, status, metrics):
+    """Добавляет завершённый запрос в итоги процесса."""
+    duration = metrics.duration
+    with _lock:
+        totals = _totals[view]
+        totals['requests'] += 1
+        totals['seconds'] += duration
+        totals[f'status_{status // 100}xx'] += 1
+        for name, value in metrics.values.items():
+            totals[name] += value
+        buckets = _buckets[view]
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                buckets[index] += 1
+                break
+        else:
+            buckets[-1] += 1
+
+
+def reset():
+    with _lock:
+        _totals.clear()
+        _buckets.clear()
+
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """Итоги процесса в текстовом формате Prometheus."""
+    with _lock:
+        totals = {view: dict(values) for view, values in _totals.items()}
+        buckets = {view: list(values) for view, values in _buckets.items()}
+    lines = [
+        '# HELP yatube_request_duration_seconds Время обработки запроса',
+        '# TYPE yatube_request_duration_seconds histogram',
+    ]
+    for view, counts in sorted(buckets.items()):
+        cumulative = 0
+        for bound, count in zip(DURATION_BUCKETS + ('+Inf',), counts):
+            cumulative += count
+            lines.append(
+                'yatube_request_duration_seconds_bucket'
+                f'{{view="{view}",le="{bound}"}} {cumulative}')
+        lines.append(
+            f'yatube_request_duration_seconds_sum{{view="{view}"}} '
+            f'{_format(totals[view]["seconds"])}')
+        lines.append(
+            f'yatube_request_duration_seconds_count{{view="{view}"}} '
+            f'{cumulative}')
+    lines += [
+        '# HELP yatube_responses_total Ответы по классам статусов',
+        '# TYPE yatube_responses_total counter',
+    ]
+    for view, values in sorted(totals.items()):
+        for name, value in sorted(values.items()):
+            if name.startswith('status_'):
+                lines.append(
+                    f'yatube_responses_total{{view="{view}",'
+                    f'status="{name[len("status_"):]}"}} {int(value)}')
+    for name, description in COUNTERS.items():
+        lines += [
+            f'# HELP yatube_{name}_total {description}',
+            f'# TYPE yatube_{name}_total counter',
+        ]
+        for view, values in sorted(totals.items()):
+            if name in values:
+                lines.append(
+                    f'yatube_{name}_total{{view="{view}"}} '
+                    f'{_format(values[name])}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db import connections
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+
+from . import db_router, metrics
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """Замеряет запрос и добавляет заголовок Server-Timing.
+
+    Ставится первым в MIDDLEWARE, чтобы учесть время остальных
+    промежуточных слоёв. Запросы дольше SLOW_REQUEST_MS пишутся в лог
+    с уровнем WARNING, остальные - INFO. Запросы к базе считает обёртка
+    connection.execute_wrapper, шаблоны - core.templates, кеш
+    карточек и миниатюры - posts.cards и posts.thumbnails.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = metrics.start()
+        try:
+            with _count_queries(request_metrics):
+                response = self.get_response(request)
+        finally:
+            metrics.finish()
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unresolved'
+        metrics.record_request(view, response.status_code, request_metrics)
+        response['Server-Timing'] = server_timing(request_metrics)
+        values = request_metrics.values
+        # Медленные запросы видны и при уровне лога WARNING по умолчанию
+        slow = request_metrics.duration * 1000 >= settings.SLOW_REQUEST_MS
+        logger.log(
+            logging.WARNING if slow else logging.INFO,
+            'request view=%s method=%s status=%s duration_ms=%.1f '
+            'sql_queries=%d sql_ms=%.1f template_ms=%.1f '
+            'cache_hits=%d cache_misses=%d thumbnail_ms=%.1f',
+            view,
+            request.method,
+            response.status_code,
+            request_metrics.duration * 1000,
+            values['sql_queries'],
+            values['sql_seconds'] * 1000,
+            values['template_seconds'] * 1000,
+            values['cache_hits'],
+            values['cache_misses'],
+            values['thumbnail_seconds'] * 1000,
+        )
+        return response
+
+
+@contextmanager
+def _count_queries(request_metrics):
+    """Считает запросы ко всем базам на время блока."""
+    values = request_metrics.values
+
+    def wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            values['sql_queries'] += 1
+            values['sql_seconds'] += time.perf_counter() - started
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+def server_timing(request_metrics):
+    """Значение заголовка Server-Timing (длительности в мс)."""
+    values = request_metrics.values
+    parts = [
+        'db;dur={:.1f};desc="SQL {}"'.format(
+            values['sql_seconds'] * 1000, int(values['sql_queries'])),
+        'tpl;dur={:.1f}'.format(values['template_seconds'] * 1000),
+        'cache;desc="hit {} miss {}"'.format(
+            int(values['cache_hits']), int(values['cache_misses'])),
+    ]
+    if values['thumbnail_seconds']:
+        parts.append(
+            'thumb;dur={:.1f}'.format(values['thumbnail_seconds'] * 1000))
+    parts.append('total;dur={:.1f}'.format(request_metrics.duration * 1000))
+    return ', '.join(parts)
+
+
+class ReplicaMiddleware:
+    """Отправляет выборки представлений из REPLICA_VIEWS в реплику.
+
+    После изменяющего запроса (не GET/HEAD/OPTIONS) клиент получает
+    cookie с временем, до которого он читает из основной базы.
+    """
+
+    cookie_name = 'db_primary_until'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            # process_view включил реплику только для этого запроса
+            db_router.set_replica_reads(False)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            seconds = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                self.cookie_name,
+                str(int(time.time()) + seconds),
+                max_age=seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        db_router.set_replica_reads(
+            request.method in SAFE_METHODS
+            and request.resolver_match.view_name in settings.REPLICA_VIEWS
+            and not self.pinned(request)
+        )
+
+    def pinned(self, request):
+        try:
+            until = int(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            return False
+        return time.time() < until
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдаёт анонимным посетителям готовые страницы из кеша.
+
+    Кешируются ответы представлений с атрибутом etag_func (его ставит
+    posts.conditional.conditional_page) для запросов без cookie
+    сессии. Ключ - адрес с параметрами и ETag страницы, поэтому новая
+    публикация вытесняет только страницы лент, где пост показан.
+    Стоит до SessionMiddleware: попадание обходит сессию, шаблон и
+    контекстные процессоры. Ответы, ставящие cookie (например, токен
+    CSRF), не кешируются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = self.cache_key(request)
+        if key is None:
+            return self.get_response(request)
+        cache = caches[settings.PAGE_CACHE]
+        response = cache.get(key)
+        if response is not None:
+            return get_conditional_response(
+                request, etag=response['ETag'], response=response)
+        response = self.get_response(request)
+        if self.cacheable(request, response):
+            cache.set(key, response, settings.PAGE_CACHE_SECONDS)
+        return response
+
+    def cache_key(self, request):
+        if (not settings.PAGE_CACHE_SECONDS
+                or request.method not in ('GET', 'HEAD')
+                or settings.SESSION_COOKIE_NAME in request.COOKIES):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        etag_func = getattr(match.func, 'etag_func', None)
+        if etag_func is None:
+            return None
+        request.resolver_match = match
+        request.user = AnonymousUser()
+        etag = etag_func(request, *match.args, **match.kwargs)
+        if etag is None:
+            return None
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return f'page:{path}:{etag}'
+
+    def cacheable(self, request, response):
+        return (
+            request.method == 'GET'
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED')
+            and response.has_header('ETag')
+        )
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+# Бэкенд sqlite с настройкой соединения из профиля SQLITE_PROFILE и
+# режимом транзакций OPTIONS['transaction_mode'] (как в Django 5.1).
+# BEGIN IMMEDIATE берёт блокировку записи в начале transaction.atomic:
+# обычный BEGIN сначала читает, и если за это время писал другой
+# процесс, переход к записи сразу падает с "database is locked" без
+# ожидания busy_timeout.
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+# journal_mode переключается до остальных настроек
+PRAGMA_ORDER = (
+    'journal_mode', 'synchronous', 'busy_timeout', 'mmap_size',
+    'cache_size', 'temp_store',
+)
+
+
+def pragmas(profile=None):
+    """PRAGMA профиля profile (по умолчанию - SQLITE_PROFILE)."""
+    values = settings.SQLITE_PROFILES[profile or settings.SQLITE_PROFILE]
+    return sorted(
+        values.items(),
+        key=lambda item: (
+            PRAGMA_ORDER.index(item[0])
+            if item[0] in PRAGMA_ORDER else len(PRAGMA_ORDER)),
+    )
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        mode = params.pop('transaction_mode', None)
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ValueError(
+                f'transaction_mode должен быть одним из {TRANSACTION_MODES}')
+        self.transaction_mode = mode.upper() if mode else None
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        # База в памяти (тесты) не настраивается: журнал и отображение
+        # файла к ней неприменимы
+        if not self.is_in_memory_db():
+            for name, value in pragmas():
+                conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
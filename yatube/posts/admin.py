@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Follow, Comment, Group, Post
+from .search import search_filter
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,6 +11,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск через полнотекстовый индекс вместо LIKE '%...%'
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(search_filter(search_term)), False
+
 
 class СommentAdmin(admin.ModelAdmin):
     list_display = ('pk', 'text', 'created', 'author', 'post',)
@@ -0,0 +1,283 @@
+import random
+import statistics
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client, RequestFactory
+from django.test.client import ClientHandler
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+
+from . import conditional, timeline
+from .bulk import keep_auto_now_add
+from .counters import recount
+from .models import Comment, Follow, Group, Post
+
+# Генератор данных и замеры лент для команд seed_data, bench_views
+# и bench_concurrency. Генератор не создаёт записи через mixer, как
+# фикстуры tests/fixtures: mixer сохраняет объекты по одному, а
+# десятки тысяч записей вставляются bulk_create. Тестам pytest те же
+# данные даёт фикстура seeded_content из tests/fixtures/fixture_data.py.
+
+User = get_user_model()
+
+PERCENTILES = (50, 90, 99)
+
+
+def seed(users, groups, posts, comments, follows, seed=0, stdout=None):
+    """Наполняет базу случайными данными через bulk_create.
+
+    После вставки пересчитываются счётчики и ленты подписок,
+    которые bulk_create обходит.
+    """
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    rnd = random.Random(seed)
+    now = timezone.now()
+
+    def log(message):
+        if stdout is not None:
+            stdout.write(message)
+
+    with transaction.atomic():
+        first_user = User.objects.count()
+        User.objects.bulk_create(
+            (
+                User(username=f'{fake.user_name()}_{first_user + i}',
+                     first_name=fake.first_name(),
+                     last_name=fake.last_name())
+                for i in range(users)
+            ),
+        )
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        log(f'пользователей: {len(user_ids)}')
+        first_group = Group.objects.count()
+        Group.objects.bulk_create(
+            (
+                Group(title=fake.sentence(nb_words=3),
+                      slug=f'group-{first_group + i}',
+                      description=fake.text(200))
+                for i in range(groups)
+            ),
+        )
+        group_ids = list(Group.objects.values_list('pk', flat=True))
+        log(f'групп: {len(group_ids)}')
+        with keep_auto_now_add(Post, 'pub_date'):
+            Post.objects.bulk_create(
+                (
+                    Post(author_id=rnd.choice(user_ids),
+                         group_id=(rnd.choice(group_ids)
+                                   if group_ids and rnd.random() < 0.7
+                                   else None),
+                         text=fake.text(400),
+                         pub_date=now - timedelta(minutes=i))
+                    for i in range(posts)
+                )
+            )
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        log(f'постов: {len(post_ids)}')
+        if post_ids:
+            with keep_auto_now_add(Comment, 'created'):
+                Comment.objects.bulk_create(
+                    (
+                        Comment(post_id=rnd.choice(post_ids),
+                                author_id=rnd.choice(user_ids),
+                                text=fake.sentence(),
+                                created=now - timedelta(seconds=i))
+                        for i in range(comments)
+                    )
+                )
+        log(f'комментариев: {Comment.objects.count()}')
+        pairs = {
+            (rnd.choice(user_ids), rnd.choice(user_ids))
+            for _ in range(follows)
+        }
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in pairs
+                if user_id != author_id
+            ),
+            ignore_conflicts=True,
+        )
+        log(f'подписок: {Follow.objects.count()}')
+        recount()
+        timeline.rebuild_many(
+            Follow.objects.values_list('user_id', flat=True).distinct())
+    # Версии меняются после фиксации, чтобы страницы не закешировались
+    # по новым версиям со старыми данными
+    conditional.bump_feeds(user_ids, group_ids, post_ids, user_ids)
+    log('счётчики и ленты пересчитаны')
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def bench_urls():
+    """Страницы для замера: первая и глубокая страницы каждой ленты."""
+    author = (
+        User.objects.filter(profile__posts_count__gt=0)
+        .order_by('-profile__posts_count').first()
+    )
+    reader = (
+        User.objects.filter(profile__following_count__gt=0)
+        .order_by('-profile__following_count').first()
+    )
+    group = Group.objects.order_by('-posts_count').first()
+    post = Post.objects.order_by('-comments_count').first()
+    urls = {
+        'index': (reverse('posts:index'), None),
+        'index_deep': (reverse('posts:index') + '?page=50', None),
+    }
+    if group is not None:
+        urls['group_posts'] = (
+            reverse('posts:group_list', args=[group.slug]), None)
+    if author is not None:
+        urls['profile'] = (
+            reverse('posts:profile', args=[author.username]), None)
+    if reader is not None:
+        urls['follow_index'] = (reverse('posts:follow_index'), reader)
+    if post is not None:
+        urls['post_detail'] = (
+            reverse('posts:post_detail', args=[post.pk]), None)
+    return urls
+
+
+def measure(repeat=20, warmup=2):
+    """Задержки, число запросов и пик памяти для каждой страницы."""
+    results = {}
+    for name, (url, user) in bench_urls().items():
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        for _ in range(warmup):
+            client.get(url)
+        timings = []
+        queries = []
+        tracemalloc.start()
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(context))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result = {
+            f'p{percent}_ms': round(percentile(timings, percent), 2)
+            for percent in PERCENTILES
+        }
+        result['mean_ms'] = round(statistics.mean(timings), 2)
+        result['queries'] = max(queries)
+        result['peak_kb'] = round(peak / 1024, 1)
+        results[name] = result
+    return results
+
+
+def compare(baseline, current, threshold):
+    """Регрессии: рост p90 или числа запросов больше порога."""
+    regressions = []
+    for name, result in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric in ('p90_ms', 'queries'):
+            if result[metric] > before[metric] * (1 + threshold):
+                regressions.append(
+                    f'{name}: {metric} {before[metric]} -> {result[metric]}')
+    return regressions
+
+
+class ThreadClient(RequestFactory):
+    """Клиент для потоков: ошибка представления - это ответ 500.
+
+    Client из django.test перехватывает исключения через сигнал
+    got_request_exception, который получают клиенты всех потоков.
+    """
+
+    def __init__(self, cookies=None):
+        super().__init__()
+        self.handler = ClientHandler(enforce_csrf_checks=False)
+        if cookies is not None:
+            self.cookies = cookies
+
+    def request(self, **request):
+        return self.handler(self._base_environ(**request))
+
+
+def timing_summary(timings, errors, seconds):
+    result = {
+        'ops': len(timings),
+        'ops_per_s': round(len(timings) / seconds, 1),
+        'errors': errors,
+    }
+    for percent in PERCENTILES:
+        result[f'p{percent}_ms'] = (
+            round(percentile(timings, percent), 2) if timings else None)
+    return result
+
+
+def concurrent(readers=4, writers=2, seconds=5.0):
+    """Пропускная способность при одновременном чтении и записи.
+
+    readers потоков читают главную ленту, writers потоков пишут
+    комментарии к свежему посту. Ответы 500 ("database is locked")
+    считаются отдельно от успешных операций.
+    """
+    post = Post.objects.order_by('-pub_date').first()
+    if post is None:
+        raise ValueError('в базе нет постов')
+    read_url = reverse('posts:index')
+    write_url = reverse('posts:add_comment', args=[post.pk])
+    clients = [('reads', ThreadClient()) for _ in range(readers)]
+    for user in User.objects.order_by('pk')[:writers]:
+        client = Client()
+        client.force_login(user)
+        clients.append(('writes', ThreadClient(client.cookies)))
+    # Соединение главного потока больше не нужно и не держит блокировок
+    connection.close()
+    timings = {'reads': [], 'writes': []}
+    errors = {'reads': 0, 'writes': 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(clients))
+
+    def work(kind, client):
+        done, failed = [], 0
+        try:
+            barrier.wait()
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                if kind == 'reads':
+                    response = client.get(read_url)
+                else:
+                    response = client.post(write_url, {'text': 'Комментарий'})
+                if response.status_code >= 500:
+                    failed += 1
+                else:
+                    done.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+        with lock:
+            timings[kind].extend(done)
+            errors[kind] += failed
+
+    threads = [
+        threading.Thread(target=work, args=client) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        kind: timing_summary(timings[kind], errors[kind], seconds)
+        for kind in timings
+    }
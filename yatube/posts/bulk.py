@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+
+from django.db import connection, models
+
+
+@contextmanager
+def keep_auto_now_add(model, *field_names):
+    """Позволяет bulk_create сохранить заданные даты.
+
+    bulk_create вызывает pre_save полей, и auto_now_add заменяет
+    переданную дату текущим временем; на время блока флаг снимается.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, saved):
+            field.auto_now_add = value
+
+
+def insert_rows(model, objs, batch_size=None, ignore_conflicts=False):
+    """Вставляет объекты model через executemany и возвращает число
+    добавленных строк.
+
+    В отличие от bulk_create запрос собирается один раз, а значения
+    берутся из атрибутов без get_db_prep_save каждого поля: это
+    основная часть времени загрузки. Подходит для моделей с полями
+    чисел, строк и дат; сигналы и pre_save (auto_now_add) не
+    вызываются. Строки, отклонённые ignore_conflicts, не считаются.
+    """
+    if not objs:
+        return 0
+    ops = connection.ops
+    before = model._default_manager.count() if ignore_conflicts else 0
+    with_pk = [obj for obj in objs if obj.pk is not None]
+    without_pk = [obj for obj in objs if obj.pk is None]
+    for group, fields in (
+        (with_pk, model._meta.concrete_fields),
+        (without_pk, [field for field in model._meta.concrete_fields
+                      if field is not model._meta.pk]),
+    ):
+        if not group:
+            continue
+        columns = ', '.join(ops.quote_name(field.column) for field in fields)
+        sql = '{} {} ({}) VALUES ({}){}'.format(
+            ops.insert_statement(ignore_conflicts=ignore_conflicts),
+            ops.quote_name(model._meta.db_table),
+            columns,
+            ', '.join(['%s'] * len(fields)),
+            ' ' + ops.ignore_conflicts_suffix_sql(ignore_conflicts)
+            if ignore_conflicts else '',
+        )
+        adapters = [
+            ops.adapt_datetimefield_value
+            if isinstance(field, models.DateTimeField) else None
+            for field in fields
+        ]
+        rows = [
+            [
+                adapt(obj.__dict__[field.attname]) if adapt
+                else obj.__dict__[field.attname]
+                for field, adapt in zip(fields, adapters)
+            ]
+            for obj in group
+        ]
+        step = batch_size or len(rows)
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), step):
+                cursor.executemany(sql, rows[start:start + step])
+    if ignore_conflicts:
+        return model._default_manager.count() - before
+    return len(objs)
@@ -0,0 +1,72 @@
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+
+from core import metrics
+
+from .versions import get_versions
+
+# Карточки постов (includes/post.html) кешируются по отдельности.
+# Ключ включает версии поста, группы и автора, которые меняют сигналы
+# при сохранении и удалении, поэтому правки видны сразу.
+
+CARD_TEMPLATE = 'includes/post.html'
+CARDS_CACHE = 'fragments'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def card_cache_stats():
+    """Попадания и промахи кеша карточек в текущем процессе."""
+    with _stats_lock:
+        return {'hits': _stats['hits'], 'misses': _stats['misses']}
+
+
+def _record(hits, misses):
+    with _stats_lock:
+        _stats['hits'] += hits
+        _stats['misses'] += misses
+    metrics.add('cache_hits', hits)
+    metrics.add('cache_misses', misses)
+
+
+def card_key(post, versions):
+    return 'post_card:{}:{}:{}:{}'.format(
+        post.pk,
+        versions[('post', post.pk)],
+        versions[('group', post.group_id)],
+        versions[('user', post.author_id)],
+    )
+
+
+def render_cards(posts):
+    """Возвращает пары (пост, html карточки) для страницы ленты.
+
+    На страницу уходит два обращения к кешу: за версиями и за
+    карточками; отрисовываются только отсутствующие карточки.
+    """
+    posts = list(posts)
+    pairs = set()
+    for post in posts:
+        pairs.update((
+            ('post', post.pk),
+            ('group', post.group_id),
+            ('user', post.author_id),
+        ))
+    cache = caches[CARDS_CACHE]
+    versions = get_versions(pairs)
+    keys = [card_key(post, versions) for post in posts]
+    cards = cache.get_many(keys)
+    rendered = {}
+    for post, key in zip(posts, keys):
+        if key not in cards:
+            rendered[key] = render_to_string(CARD_TEMPLATE, {'post': post})
+    if rendered:
+        cache.set_many(rendered, timeout=settings.POST_CARD_TIMEOUT)
+        cards.update(rendered)
+    _record(hits=len(posts) - len(rendered), misses=len(rendered))
+    return [(post, cards[key]) for post, key in zip(posts, keys)]
@@ -0,0 +1,134 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .models import Group, Post, User
+from .versions import bump, bump_many, get_versions
+
+# Условные GET для лент и страницы поста. ETag страницы - хеш версий
+# (posts.versions) всего, что на ней показано: ленты (меняется при
+# публикации, правке и удалении поста), имён авторов и названий групп,
+# комментариев поста и подписок читателя. Валидатор стоит одного
+# обращения к кешу и не больше одного запроса по ключу, а при
+# совпадении ETag представление отвечает 304 без отрисовки шаблона.
+
+# Имена пользователей и группы видны в карточках любой ленты
+NAMES = ('feed', 'names')
+# Версий, которые bump_feeds меняет по одной
+BUMP_LIMIT = 1000
+
+
+def feed_scope(kind, pk=None):
+    """Пара (scope, pk) версии ленты: index, author-<id>, group-<id>."""
+    return ('feed', kind if pk is None else f'{kind}-{pk}')
+
+
+def bump_post_pages(post_id, author_id, group_id):
+    """Новая версия поста и всех лент, в которых он показан."""
+    bump('post', post_id)
+    bump(*feed_scope('index'))
+    bump(*feed_scope('author', author_id))
+    if group_id is not None:
+        bump(*feed_scope('group', group_id))
+
+
+def bump_feeds(author_ids=(), group_ids=(), commented_post_ids=(),
+               reader_ids=()):
+    """Новые версии лент после записи в обход сигналов (bulk_create).
+
+    Если затронуто больше BUMP_LIMIT объектов, меняется версия NAMES,
+    которая входит в ETag каждой страницы: десятки тысяч версий по
+    одной дороже, чем однократный сброс всех страниц после загрузки.
+    """
+    pairs = [
+        *(feed_scope('author', pk) for pk in author_ids),
+        *(feed_scope('group', pk) for pk in group_ids),
+        *(('comments', pk) for pk in commented_post_ids),
+        *(('following', pk) for pk in reader_ids),
+    ]
+    if len(pairs) > BUMP_LIMIT:
+        pairs = [NAMES]
+    bump_many([feed_scope('index'), *pairs])
+
+
+def page_etag(request, pairs):
+    user = request.user
+    pairs = [NAMES, *pairs]
+    if user.is_authenticated:
+        # Кнопки подписки и шапка зависят от читателя
+        pairs.append(('following', user.pk))
+    versions = get_versions(pairs)
+    parts = [settings.PAGE_VERSION, user.pk]
+    parts.extend(versions[pair] for pair in pairs)
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def index_etag(request):
+    return page_etag(request, [feed_scope('index')])
+
+
+def group_etag(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    if group_id is None:
+        return None
+    return page_etag(
+        request, [feed_scope('group', group_id), ('group', group_id)])
+
+
+def profile_etag(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author_id is None:
+        return None
+    return page_etag(
+        request, [feed_scope('author', author_id), ('user', author_id)])
+
+
+def post_etag(request, post_id):
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id').first()
+    if post is None:
+        return None
+    author_id, group_id = post
+    return page_etag(request, [
+        ('post', post_id),
+        ('comments', post_id),
+        ('user', author_id),
+        ('group', group_id),
+        # Число постов автора на странице поста
+        feed_scope('author', author_id),
+    ])
+
+
+def conditional_page(etag_func):
+    """Отвечает 304 по ETag и добавляет заголовки для прокси.
+
+    Анонимную страницу обратный прокси может хранить
+    PUBLIC_CACHE_SECONDS секунд и затем проверять по ETag; страница
+    читателя хранится только в браузере и проверяется каждый раз.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.method not in ('GET', 'HEAD'):
+                return response
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(
+                    response, public=True, max_age=0,
+                    s_maxage=settings.PUBLIC_CACHE_SECONDS)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        # По нему core.middleware.AnonymousPageCacheMiddleware находит
+        # страницу в кеше, не вызывая представление
+        wrapper.etag_func = etag_func
+        return wrapper
+    return decorator
@@ -0,0 +1,101 @@
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import router
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# Денормализованные счётчики: посты и комментарии автора, подписчики
+# и подписки (Profile), посты группы (Group), комментарии поста (Post).
+# Изменяются одним UPDATE ... SET field = field ± 1 внутри транзакции
+# записи, поэтому параллельные запросы не теряют приращения.
+
+PROFILE_COUNTERS = (
+    'posts_count',
+    'comments_count',
+    'followers_count',
+    'following_count',
+)
+
+
+def change(model, pk, field, delta):
+    """Изменяет счётчик field у записи model на delta."""
+    if pk is None:
+        return 0
+    return model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def change_profile(user_id, field, delta):
+    """Изменяет счётчик в профиле автора, создавая профиль при нужде."""
+    Profile = global_apps.get_model('posts', 'Profile')
+    if change(Profile, user_id, field, delta) or delta < 0:
+        return
+    # Профиля ещё нет (пользователь создан в обход сигналов):
+    # создаём его сразу с пересчитанными значениями
+    Profile.objects.get_or_create(user_id=user_id)
+    recount_profiles(Profile.objects.filter(pk=user_id))
+
+
+def get_profile(user):
+    """Профиль автора; отсутствующий создаётся с пересчётом счётчиков."""
+    Profile = global_apps.get_model('posts', 'Profile')
+    try:
+        return user.profile
+    except Profile.DoesNotExist:
+        Profile.objects.get_or_create(user_id=user.pk)
+        recount_profiles(Profile.objects.filter(pk=user.pk))
+        # Только что созданный профиль читаем из основной базы,
+        # в реплику он мог ещё не попасть
+        user.profile = Profile.objects.db_manager(
+            router.db_for_write(Profile)).get(pk=user.pk)
+        return user.profile
+
+
+def _count(queryset, field):
+    """Коррелированный подзапрос COUNT(*) по полю field."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount_profiles(profiles, apps=global_apps):
+    """Пересчитывает счётчики профилей одним UPDATE."""
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    return profiles.update(
+        posts_count=_count(Post.objects.all(), 'author'),
+        comments_count=_count(Comment.objects.all(), 'author'),
+        followers_count=_count(Follow.objects.all(), 'author'),
+        following_count=_count(Follow.objects.all(), 'user'),
+    )
+
+
+def recount(apps=global_apps):
+    """Создаёт недостающие профили и пересчитывает все счётчики."""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Profile = apps.get_model('posts', 'Profile')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    missing = User.objects.filter(profile__isnull=True).values_list(
+        'pk', flat=True)
+    Profile.objects.bulk_create(
+        (Profile(user_id=user_id) for user_id in missing.iterator()),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    return {
+        'profiles': recount_profiles(Profile.objects.all(), apps),
+        'groups': Group.objects.update(
+            posts_count=_count(Post.objects.all(), 'group')),
+        'posts': Post.objects.update(
+            comments_count=_count(Comment.objects.all(), 'post')),
+    }
@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection, connections
+
+# Число записей для нумерованных страниц без COUNT(*) по всей ленте.
+# Сначала считается не больше COUNT_EXACT_LIMIT + 1 записей: короткая
+# лента получает точное число. Для длинной берётся точный подсчёт из
+# кеша, который обновляется в фоне раз в COUNT_REFRESH_SECONDS, а до
+# первого подсчёта - статистика базы (sqlite_stat1 после ANALYZE,
+# pg_class.reltuples), если лента - вся таблица без условий.
+# Выборкам по произвольным условиям (поиск) ключ в кеше не заводится:
+# им хватает ограниченного подсчёта capped_count.
+
+COUNT_CACHE_TIMEOUT = 60 * 60 * 24
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def count_key(key):
+    return f'count:{key}'
+
+
+def table_statistics(model, using):
+    """Число строк таблицы model по статистике базы или None."""
+    conn = connections[using]
+    table = model._meta.db_table
+    if conn.vendor == 'sqlite':
+        # Первое число stat - строки таблицы (индекса) на момент ANALYZE
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+    elif conn.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass'
+    else:
+        return None
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        # sqlite_stat1 появляется только после первого ANALYZE
+        return None
+    if row is None:
+        return None
+    rows = int(str(row[0]).split()[0])
+    return rows if rows >= 0 else None
+
+
+def refresh(queryset, key, in_thread=False):
+    """Точно пересчитывает queryset и кладёт число в кеш."""
+    try:
+        started = time.perf_counter()
+        total = queryset.count()
+        cache.set(count_key(key), (total, time.time()), COUNT_CACHE_TIMEOUT)
+        logger.debug('count %s = %d за %.1f мс', key, total,
+                     (time.perf_counter() - started) * 1000)
+    except Exception:
+        logger.exception('Не удалось пересчитать %s', key)
+    finally:
+        with _pending_lock:
+            _pending.discard(key)
+        if in_thread:
+            connection.close()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='counts')
+        return _executor
+
+
+def run_async():
+    # Как и миниатюры: база sqlite в памяти (тесты) не даёт потокам
+    # ждать блокировку, там подсчёт идёт сразу
+    in_memory = getattr(connection, 'is_in_memory_db', lambda: False)()
+    return not in_memory
+
+
+def schedule_refresh(queryset, key):
+    with _pending_lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+    queryset = queryset.order_by()
+    if run_async():
+        get_executor().submit(refresh, queryset, key, True)
+    else:
+        refresh(queryset, key)
+
+
+def capped_count(queryset):
+    """Точное число записей queryset, но не больше COUNT_EXACT_LIMIT + 1."""
+    return queryset.order_by()[:settings.COUNT_EXACT_LIMIT + 1].count()
+
+
+def estimated_count(queryset, key):
+    """Число записей queryset: точное до COUNT_EXACT_LIMIT, дальше
+    приблизительное. key отличает ленты в кеше.
+    """
+    cached = cache.get(count_key(key))
+    if cached is not None:
+        total, counted_at = cached
+        if time.time() - counted_at > settings.COUNT_REFRESH_SECONDS:
+            schedule_refresh(queryset, key)
+        return total
+    probe = capped_count(queryset)
+    if probe <= settings.COUNT_EXACT_LIMIT:
+        return probe
+    estimate = None
+    if not queryset.query.where:
+        estimate = table_statistics(queryset.model, queryset.db)
+    schedule_refresh(queryset, key)
+    cached = cache.get(count_key(key))
+    if cached is not None:
+        return cached[0]
+    return max(probe, estimate or 0)
@@ -0,0 +1,91 @@
+import csv
+import json
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment
+
+# Выгрузка архива автора или группы. Записи читаются из базы порциями
+# через iterator(chunk_size=...) и сразу превращаются в строки, поэтому
+# память не зависит от размера архива. Формат записей совпадает с
+# форматом загрузки posts.imports: сначала посты, затем комментарии.
+
+EXPORT_CHUNK_SIZE = 2000
+CSV_FIELDS = (
+    'type', 'id', 'post', 'author', 'group', 'text', 'pub_date',
+    'created', 'image', 'image_url',
+)
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def export_records(posts):
+    """Записи постов из queryset posts и комментариев к ним."""
+    rows = (
+        posts.order_by('pk')
+        .values_list('pk', 'author__username', 'group__slug', 'text',
+                     'pub_date', 'image')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for pk, author, group, text, pub_date, image in rows:
+        yield {
+            'type': 'post',
+            'id': pk,
+            'author': author,
+            'group': group,
+            'text': text,
+            'pub_date': pub_date,
+            'image': image,
+            'image_url': default_storage.url(image) if image else '',
+        }
+    comments = (
+        Comment.objects.filter(post__in=posts.order_by().values('pk'))
+        .order_by('pk')
+        .values_list('post_id', 'author__username', 'text', 'created')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for post_id, author, text, created in comments:
+        yield {
+            'type': 'comment',
+            'post': post_id,
+            'author': author,
+            'text': text,
+            'created': created,
+        }
+
+
+def jsonl_lines(records):
+    for record in records:
+        yield json.dumps(
+            record, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """Буфер для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    writer = csv.DictWriter(_Echo(), CSV_FIELDS)
+    yield writer.writerow(dict(zip(CSV_FIELDS, CSV_FIELDS)))
+    for record in records:
+        for field in ('pub_date', 'created'):
+            if record.get(field):
+                record[field] = record[field].isoformat()
+        yield writer.writerow(record)
+
+
+FORMATS = {
+    'jsonl': jsonl_lines,
+    'csv': csv_lines,
+}
+
+
+def export_lines(posts, export_format):
+    """Строки выгрузки в формате export_format ('jsonl' или 'csv')."""
+    return FORMATS[export_format](export_records(posts))
@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, router, transaction
+
+from .models import Follow
+
+# Подписка - одна вставка без предварительной проверки exists():
+# дубликат отклоняет ограничение unique_following. Отписка удаляет
+# заблокированную строку, поэтому из параллельных запросов её удаляет
+# только один. Обе операции идемпотентны.
+#
+# Состояние подписок для кнопок в лентах загружается сразу для всех
+# авторов страницы: один запрос на промахи кеша, результат запоминается
+# на время запроса и в кеше на FOLLOW_STATE_TIMEOUT секунд. Сигналы
+# подписки сбрасывают запись кеша пары (forget_state).
+
+
+def follow(user, author_id):
+    """Подписывает user на автора; True, если подписка создана."""
+    if user.pk == author_id:
+        return False
+    try:
+        # Точка сохранения: ошибка вставки не ломает внешнюю транзакцию
+        with transaction.atomic():
+            Follow.objects.create(user=user, author_id=author_id)
+    except IntegrityError:
+        return False
+    return True
+
+
+def unfollow(user, author_id):
+    """Отписывает user от автора; True, если подписка была удалена."""
+    using = router.db_for_write(Follow)
+    # Удаление и обработчики сигнала (счётчики, лента) - одна транзакция
+    with transaction.atomic(using=using):
+        # QuerySet.delete() выбирает строки до DELETE и шлёт post_delete
+        # каждой выбранной. Блокировка строки заставляет параллельную
+        # отписку дождаться конца транзакции и уже не найти подписку,
+        # иначе счётчики уменьшились бы дважды. В sqlite запись и так
+        # идёт по одной транзакции (BEGIN IMMEDIATE, core.sqlite).
+        pks = list(
+            Follow.objects.using(using).select_for_update()
+            .filter(user=user, author_id=author_id)
+            .values_list('pk', flat=True)
+        )
+        if not pks:
+            return False
+        Follow.objects.using(using).filter(pk__in=pks).delete()
+    return True
+
+
+def state_key(user_id, author_id):
+    return f'follow_state:{user_id}:{author_id}'
+
+
+def forget_state(user_id, author_id):
+    cache.delete(state_key(user_id, author_id))
+
+
+def followed_authors(request, author_ids):
+    """Id авторов из author_ids, на которых подписан пользователь запроса.
+
+    Уже известные в этом запросе авторы не запрашиваются повторно,
+    остальные берутся из кеша, а промахи - одним запросом к базе.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return set()
+    known = request.__dict__.setdefault('_follow_states', {})
+    missing = set(author_ids) - known.keys()
+    if missing:
+        keys = {state_key(user.pk, author_id): author_id
+                for author_id in missing}
+        cached = cache.get_many(keys)
+        for key, following in cached.items():
+            known[keys[key]] = following
+        missing -= {keys[key] for key in cached}
+    if missing:
+        followed = set(
+            Follow.objects.filter(user=user, author_id__in=missing)
+            .values_list('author_id', flat=True)
+        )
+        states = {author_id: author_id in followed for author_id in missing}
+        known.update(states)
+        cache.set_many(
+            {state_key(user.pk, author_id): following
+             for author_id, following in states.items()},
+            timeout=settings.FOLLOW_STATE_TIMEOUT,
+        )
+    return {author_id for author_id in author_ids if known[author_id]}
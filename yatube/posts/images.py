@@ -0,0 +1,80 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from PIL import Image, ImageOps
+
+# Обработка картинки при загрузке: размеры проверяются по заголовку
+# файла без декодирования, большие фото уменьшаются до
+# POST_IMAGE_MAX_SIZE, метаданные (EXIF и прочее) не сохраняются,
+# результат пишется в компактном формате POST_IMAGE_FORMAT.
+
+FORMAT_EXTENSIONS = {
+    'JPEG': 'jpg',
+    'WEBP': 'webp',
+}
+
+
+def _flatten(image, image_format):
+    """Приводит картинку к режиму, который поддерживает формат."""
+    if image_format == 'WEBP' and image.mode in ('RGBA', 'LA', 'P'):
+        return image.convert('RGBA')
+    if image.mode in ('RGBA', 'LA') or (
+            image.mode == 'P' and 'transparency' in image.info):
+        # Прозрачность JPEG не поддерживает - кладём на белый фон
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def process_image(uploaded):
+    """Проверяет и ужимает загруженную картинку.
+
+    Возвращает новый файл для ImageField или исходный, если
+    перекодировать его не нужно (небольшой GIF - сохраняем анимацию).
+    """
+    if uploaded.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError('Файл картинки слишком большой.')
+    uploaded.seek(0)
+    # open читает только заголовок, пиксели ещё не декодированы
+    image = Image.open(uploaded)
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Картинка {width}x{height} слишком большая по размерам.')
+    max_size = settings.POST_IMAGE_MAX_SIZE
+    if image.format == 'GIF' and max(width, height) <= max_size:
+        uploaded.seek(0)
+        return uploaded
+    # Для JPEG draft уменьшает картинку прямо при декодировании
+    image.draft('RGB', (max_size, max_size))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    image_format = settings.POST_IMAGE_FORMAT
+    image = _flatten(image, image_format)
+    output = BytesIO()
+    # info и exif не передаются в save, поэтому метаданные отбрасываются
+    image.save(
+        output,
+        format=image_format,
+        quality=settings.POST_IMAGE_QUALITY,
+        optimize=True,
+    )
+    size = output.tell()
+    output.seek(0)
+    name = '{}.{}'.format(
+        os.path.splitext(os.path.basename(uploaded.name))[0],
+        FORMAT_EXTENSIONS[image_format],
+    )
+    return InMemoryUploadedFile(
+        file=output,
+        field_name=getattr(uploaded, 'field_name', None),
+        name=name,
+        content_type=Image.MIME[image_format],
+        size=size,
+        charset=None,
+    )
@@ -0,0 +1,322 @@
+import csv
+import json
+import os
+import sqlite3
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import conditional, timeline
+from .bulk import insert_rows
+from .counters import recount
+from .models import Comment, Follow, Group, Post
+
+# Массовая загрузка постов, комментариев и подписок из JSONL или CSV.
+# Записи читаются потоком и вставляются порциями через executemany
+# (posts.bulk.insert_rows), каждая порция - в своей транзакции. После
+# порции номер строки пишется в файл контрольной точки вместе с id
+# авторов и читателей, чьи ленты подписок затронуты, так что прерванную
+# загрузку можно продолжить. Вставка не вызывает сигналы, поэтому счётчики и
+# ленты подписок пересчитываются, а версии страниц (posts.conditional)
+# меняются в конце.
+#
+# Формат записей (поле type или опция --type для всего файла):
+#   post:    id, author, group, text, pub_date, image
+#   comment: post, author, text, created
+#   follow:  user, author
+# author и user - имена пользователей, group - slug группы, post - id
+# поста. id постов сохраняются, чтобы на них ссылались комментарии.
+
+RECORD_TYPES = ('post', 'comment', 'follow')
+# Id, затронутые загрузкой; сохраняются в контрольной точке
+TRACKED = ('authors', 'readers', 'groups_touched', 'commented')
+CHUNK_SIZE = 5000
+# sqlite вставляет несколько строк через UNION ALL, а в одном
+# составном SELECT не больше 500 частей
+SQLITE_MAX_BATCH = 500
+# Предел параметров запроса начиная с sqlite 3.32 (раньше - 999,
+# на него и рассчитан размер порции Django по умолчанию)
+SQLITE_MAX_VARIABLES = 32766
+
+User = get_user_model()
+
+
+class RecordError(Exception):
+    """Ошибка в записи входного файла."""
+
+
+def read_records(path, record_type=None):
+    """Записи файла по одной: JSONL или CSV (по расширению)."""
+    with open(path, newline='', encoding='utf-8') as file:
+        if path.endswith('.csv'):
+            for row in csv.DictReader(file):
+                if record_type and not row.get('type'):
+                    row['type'] = record_type
+                yield row
+            return
+        for line in file:
+            if not line.strip():
+                yield {}
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                record = {'error': f'некорректный JSON: {error}'}
+            if record_type:
+                record.setdefault('type', record_type)
+            yield record
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise RecordError(f'некорректная дата {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def comment_post_id(record):
+    try:
+        return int(record.get('post'))
+    except (TypeError, ValueError):
+        raise RecordError(f'некорректный пост {record.get("post")!r}')
+
+
+class Importer:
+    """Загружает записи порциями, разрешая ссылки по словарям в памяти."""
+
+    def __init__(self, create_users=False, batch_size=None, stdout=None):
+        self.create_users = create_users
+        self.batch_size = batch_size
+        self.stdout = stdout
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.created = dict.fromkeys(RECORD_TYPES, 0)
+        self.errors = []
+        self.authors = set()
+        self.readers = set()
+        self.groups_touched = set()
+        self.commented = set()
+
+    def batch(self, model):
+        """Строк в одном INSERT для model."""
+        if self.batch_size or connection.vendor != 'sqlite':
+            return self.batch_size
+        if sqlite3.sqlite_version_info < (3, 32):
+            return None
+        fields = len(model._meta.concrete_fields)
+        return min(SQLITE_MAX_BATCH, SQLITE_MAX_VARIABLES // fields)
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def user_id(self, username):
+        if not username:
+            raise RecordError('не указан пользователь')
+        try:
+            return self.users[username]
+        except KeyError:
+            raise RecordError(f'неизвестный пользователь {username!r}')
+
+    def add_missing_users(self, records):
+        names = {
+            record.get(field)
+            for record in records
+            for field in ('author', 'user')
+            if record.get(field)
+        } - self.users.keys()
+        if not names:
+            return
+        # Пароль непригодный: пользователи восстановят его по почте
+        User.objects.bulk_create(
+            (User(username=name, password=make_password(None))
+             for name in names),
+            batch_size=self.batch(User),
+            ignore_conflicts=True,
+        )
+        self.users.update(
+            User.objects.filter(username__in=names)
+            .values_list('username', 'pk')
+        )
+
+    def build_post(self, record):
+        group = record.get('group') or None
+        if group is not None and group not in self.groups:
+            raise RecordError(f'неизвестная группа {group!r}')
+        if not record.get('text'):
+            raise RecordError('пустой текст поста')
+        return Post(
+            pk=record.get('id') or None,
+            author_id=self.user_id(record.get('author')),
+            group_id=self.groups.get(group),
+            text=record['text'],
+            pub_date=parse_date(record.get('pub_date')),
+            image=record.get('image') or '',
+        )
+
+    def build_comment(self, record, post_ids):
+        post_id = comment_post_id(record)
+        if post_id not in post_ids:
+            raise RecordError(f'нет поста {post_id}')
+        if not record.get('text'):
+            raise RecordError('пустой текст комментария')
+        return Comment(
+            post_id=post_id,
+            author_id=self.user_id(record.get('author')),
+            text=record['text'],
+            created=parse_date(record.get('created')),
+        )
+
+    def build_comments(self, comment_records):
+        """Комментарии порции; посты проверяются одним запросом.
+
+        Вызывается после вставки постов, так как комментарии могут
+        ссылаться на посты из той же порции.
+        """
+        wanted = set()
+        for _, record in comment_records:
+            try:
+                wanted.add(comment_post_id(record))
+            except RecordError:
+                pass
+        post_ids = set(
+            Post.objects.filter(pk__in=wanted).values_list('pk', flat=True))
+        comments = []
+        for line, record in comment_records:
+            try:
+                comments.append(self.build_comment(record, post_ids))
+            except RecordError as error:
+                self.errors.append((line, str(error)))
+        return comments
+
+    def build_follow(self, record):
+        user_id = self.user_id(record.get('user'))
+        author_id = self.user_id(record.get('author'))
+        if user_id == author_id:
+            raise RecordError('подписка на самого себя')
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def import_chunk(self, records, first_line):
+        """Вставляет порцию записей одной транзакцией."""
+        if self.create_users:
+            self.add_missing_users(records)
+        posts, comment_records, follows = [], [], []
+        for line, record in enumerate(records, first_line):
+            if not record:
+                continue
+            try:
+                if 'error' in record:
+                    raise RecordError(record['error'])
+                record_type = record.get('type')
+                if record_type == 'post':
+                    posts.append(self.build_post(record))
+                elif record_type == 'comment':
+                    comment_records.append((line, record))
+                elif record_type == 'follow':
+                    follows.append(self.build_follow(record))
+                else:
+                    raise RecordError(f'неизвестный тип {record_type!r}')
+            except RecordError as error:
+                self.errors.append((line, str(error)))
+        # Повторно присланные посты и подписки (например, при --resume)
+        # пропускаются и в итогах не считаются
+        self.created['post'] += insert_rows(
+            Post, posts, self.batch_size, ignore_conflicts=True)
+        comments = self.build_comments(comment_records)
+        self.created['comment'] += insert_rows(
+            Comment, comments, self.batch_size)
+        self.created['follow'] += insert_rows(
+            Follow, follows, self.batch_size, ignore_conflicts=True)
+        self.authors.update(post.author_id for post in posts)
+        self.groups_touched.update(
+            post.group_id for post in posts if post.group_id is not None)
+        self.commented.update(comment.post_id for comment in comments)
+        self.readers.update(follow.user_id for follow in follows)
+
+    def finish(self):
+        """Восстанавливает то, что обычно поддерживают сигналы."""
+        with transaction.atomic():
+            if self.created['post']:
+                # Явные id постов не двигают последовательность в PostgreSQL
+                with connection.cursor() as cursor:
+                    for sql in connection.ops.sequence_reset_sql(
+                            no_style(), [Post]):
+                        cursor.execute(sql)
+            recount()
+        readers = (
+            Follow.objects.filter(
+                Q(user_id__in=self.readers) | Q(author_id__in=self.authors))
+            .values_list('user_id', flat=True)
+            .distinct()
+        )
+        with transaction.atomic():
+            timeline.rebuild_many(readers)
+        conditional.bump_feeds(
+            self.authors, self.groups_touched, self.commented, self.readers)
+
+
+def checkpoint_path(path):
+    return f'{path}.progress'
+
+
+def read_checkpoint(checkpoint, importer):
+    """Номер последней загруженной строки; ленты - в importer."""
+    with open(checkpoint) as file:
+        state = json.loads(file.read() or '0')
+    if isinstance(state, int):
+        # Контрольная точка старого формата - только номер строки
+        return state
+    for name in TRACKED:
+        getattr(importer, name).update(state.get(name, ()))
+    return state['line']
+
+
+def write_checkpoint(checkpoint, importer, done):
+    state = {'line': done}
+    for name in TRACKED:
+        state[name] = sorted(getattr(importer, name))
+    with open(checkpoint, 'w') as file:
+        json.dump(state, file)
+
+
+def import_file(path, record_type=None, chunk_size=CHUNK_SIZE,
+                batch_size=None, create_users=False, resume=False,
+                stdout=None):
+    """Загружает файл и возвращает Importer с итогами."""
+    importer = Importer(
+        create_users=create_users, batch_size=batch_size, stdout=stdout)
+    checkpoint = checkpoint_path(path)
+    done = 0
+    if resume and os.path.exists(checkpoint):
+        done = read_checkpoint(checkpoint, importer)
+        importer.log(f'продолжение со строки {done + 1}')
+    records = islice(read_records(path, record_type), done, None)
+    started = time.perf_counter()
+    processed = 0
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        with transaction.atomic():
+            importer.import_chunk(chunk, done + 1)
+        done += len(chunk)
+        processed += len(chunk)
+        write_checkpoint(checkpoint, importer, done)
+        elapsed = time.perf_counter() - started
+        importer.log(
+            f'строк: {done}, {processed / elapsed:.0f} строк/с')
+    importer.finish()
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return importer
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.sqlite.base import TRANSACTION_MODES
+from posts.bench import concurrent
+
+COLUMNS = ('ops', 'ops_per_s', 'p50_ms', 'p90_ms', 'p99_ms', 'errors')
+
+
+class Command(BaseCommand):
+    help = ('Замеряет пропускную способность ленты при одновременной '
+            'записи комментариев')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument(
+            '--profile', choices=sorted(settings.SQLITE_PROFILES),
+            help='Профиль sqlite (по умолчанию SQLITE_PROFILE)')
+        parser.add_argument(
+            '--conn-max-age', type=int,
+            help='Время жизни соединения (по умолчанию CONN_MAX_AGE)')
+        parser.add_argument(
+            '--transaction-mode', choices=TRANSACTION_MODES,
+            help='Начало транзакции (по умолчанию SQLITE_TRANSACTION_MODE)')
+
+    def handle(self, *args, **options):
+        debug, profile = settings.DEBUG, settings.SQLITE_PROFILE
+        # Без DEBUG запросы не копятся в connection.queries, а ошибки
+        # блокировки не печатают трассировку на каждый запрос
+        settings.DEBUG = False
+        if options['profile']:
+            settings.SQLITE_PROFILE = options['profile']
+        database = connections.databases['default']
+        saved = database['CONN_MAX_AGE'], dict(database['OPTIONS'])
+        if options['conn_max_age'] is not None:
+            database['CONN_MAX_AGE'] = options['conn_max_age']
+        if options['transaction_mode']:
+            database['OPTIONS']['transaction_mode'] = (
+                options['transaction_mode'])
+        # Новое соединение получит PRAGMA выбранного профиля
+        connections.close_all()
+        try:
+            results = concurrent(
+                readers=options['readers'],
+                writers=options['writers'],
+                seconds=options['seconds'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        finally:
+            settings.DEBUG, settings.SQLITE_PROFILE = debug, profile
+            database['CONN_MAX_AGE'], database['OPTIONS'] = saved
+        self.stdout.write(
+            f'{"":<8}' + ''.join(f'{column:>11}' for column in COLUMNS))
+        for kind, result in results.items():
+            self.stdout.write(f'{kind:<8}' + ''.join(
+                f'{str(result[column]):>11}' for column in COLUMNS))
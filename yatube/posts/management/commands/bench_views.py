@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.bench import compare, measure
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержки (перцентили), число SQL-запросов и пик '
+            'памяти лент; сравнивает с сохранённым прогоном')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--save', help='Сохранить результаты в JSON')
+        parser.add_argument(
+            '--compare', help='JSON предыдущего прогона для сравнения')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост p90 и числа запросов (доля)')
+
+    def handle(self, *args, **options):
+        results = measure(repeat=options['repeat'])
+        header = f'{"страница":<14}' + ''.join(
+            f'{column:>10}' for column in
+            ('p50_ms', 'p90_ms', 'p99_ms', 'queries', 'peak_kb'))
+        self.stdout.write(header)
+        for name, result in results.items():
+            self.stdout.write(f'{name:<14}' + ''.join(
+                f'{result[column]:>10}' for column in
+                ('p50_ms', 'p90_ms', 'p99_ms', 'queries', 'peak_kb')))
+        if options['save']:
+            with open(options['save'], 'w') as file:
+                json.dump(results, file, indent=2)
+        if options['compare']:
+            with open(options['compare']) as file:
+                baseline = json.load(file)
+            regressions = compare(baseline, results, options['threshold'])
+            if regressions:
+                raise CommandError(
+                    'Регрессии:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
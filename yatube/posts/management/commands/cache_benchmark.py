@@ -0,0 +1,71 @@
+import multiprocessing
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from posts.cards import card_cache_stats
+from posts.models import Group
+
+
+def run_worker(number, urls, rounds):
+    # После fork каждый процесс открывает своё соединение с базой
+    connections.close_all()
+    # Разный порядок страниц в воркерах: при общем кеше страница,
+    # уже отрисованная соседом, должна отдаваться из кеша
+    urls = list(urls)
+    random.Random(number).shuffle(urls)
+    client = Client()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for url in urls:
+            client.get(url)
+    return card_cache_stats(), time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет ленты в нескольких процессах и показывает '
+            'долю попаданий в кеш карточек для текущего CACHE_BACKEND')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--pages', type=int, default=5)
+
+    def handle(self, *args, **options):
+        urls = [
+            f'{reverse("posts:index")}?page={page}'
+            for page in range(1, options['pages'] + 1)
+        ]
+        urls += [
+            reverse('posts:group_list', args=[slug])
+            for slug in Group.objects.values_list('slug', flat=True)[:5]
+        ]
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with context.Pool(options['workers']) as pool:
+            results = pool.starmap(
+                run_worker,
+                [
+                    (number, urls, options['rounds'])
+                    for number in range(options['workers'])
+                ],
+            )
+        backend = settings.CACHES['fragments']['BACKEND']
+        self.stdout.write(f'Бэкенд: {backend}')
+        hits = misses = 0
+        for number, (stats, elapsed) in enumerate(results, start=1):
+            hits += stats['hits']
+            misses += stats['misses']
+            self.stdout.write(
+                f'воркер {number}: попаданий {stats["hits"]}, '
+                f'промахов {stats["misses"]}, {elapsed:.2f} с'
+            )
+        total = hits + misses
+        rate = hits / total if total else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Доля попаданий: {rate:.1%} ({hits} из {total})'))
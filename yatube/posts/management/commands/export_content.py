@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exports import FORMATS, export_lines
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты и комментарии автора или группы в JSONL или CSV'
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--author', help='Имя пользователя автора')
+        source.add_argument('--group', help='Slug группы')
+        parser.add_argument(
+            '--format', choices=FORMATS, default='jsonl',
+            help='Формат выгрузки')
+        parser.add_argument(
+            '--output', help='Файл выгрузки (по умолчанию - stdout)')
+
+    def handle(self, *args, **options):
+        if options['author']:
+            try:
+                author = User.objects.get(username=options['author'])
+            except User.DoesNotExist:
+                raise CommandError(
+                    f'Пользователь {options["author"]} не найден')
+            posts = Post.objects.filter(author=author)
+        else:
+            try:
+                group = Group.objects.get(slug=options['group'])
+            except Group.DoesNotExist:
+                raise CommandError(f'Группа {options["group"]} не найдена')
+            posts = Post.objects.filter(group=group)
+        lines = export_lines(posts, options['format'])
+        if not options['output']:
+            for line in lines:
+                # Строки выгрузки уже оканчиваются переводом строки
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as file:
+            file.writelines(lines)
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгрузка сохранена в {options["output"]}'))
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.imports import CHUNK_SIZE, RECORD_TYPES, import_file
+
+# Сколько ошибочных строк показывать в отчёте
+SHOWN_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = 'Загружает посты, комментарии и подписки из JSONL или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .jsonl или .csv')
+        parser.add_argument(
+            '--type', choices=RECORD_TYPES,
+            help='Тип записей, у которых нет поля type')
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Строк в одной транзакции')
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Строк в одном INSERT (по умолчанию - предел базы)')
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создавать неизвестных пользователей')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить с контрольной точки прерванной загрузки')
+
+    def handle(self, *args, **options):
+        # При DEBUG каждый INSERT с тысячами параметров форматируется
+        # для connection.queries - это половина времени загрузки
+        debug, settings.DEBUG = settings.DEBUG, False
+        try:
+            importer = import_file(
+                options['path'],
+                record_type=options['type'],
+                chunk_size=options['chunk_size'],
+                batch_size=options['batch_size'],
+                create_users=options['create_users'],
+                resume=options['resume'],
+                stdout=self.stdout,
+            )
+        except OSError as error:
+            raise CommandError(error)
+        finally:
+            settings.DEBUG = debug
+        for line, message in importer.errors[:SHOWN_ERRORS]:
+            self.stderr.write(f'строка {line}: {message}')
+        if len(importer.errors) > SHOWN_ERRORS:
+            self.stderr.write(
+                f'... ещё ошибок: {len(importer.errors) - SHOWN_ERRORS}')
+        for record_type, count in importer.created.items():
+            self.stdout.write(f'{record_type}: {count}')
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и подписок'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = recount()
+        for name, rows in updated.items():
+            self.stdout.write(f'{name}: {rows}')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
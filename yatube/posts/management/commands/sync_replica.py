@@ -0,0 +1,29 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.db_router import REPLICA_ALIAS
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу sqlite в файл реплики '
+            '(для проверки чтения из реплики локально)')
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        replica = connections.databases[REPLICA_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError(
+                'Реплику другой базы настраивает её собственная репликация')
+        if replica['NAME'] == primary.settings_dict['NAME']:
+            raise CommandError('REPLICA_DATABASE не задана')
+        primary.ensure_connection()
+        target = sqlite3.connect(replica['NAME'])
+        try:
+            # Онлайн-копия: запись в основную базу не блокируется
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Реплика {replica["NAME"]} обновлена'))
@@ -16,6 +16,11 @@ class Group(models.Model):
         unique=True,
     )
     description = models.TextField(verbose_name="Описание",)
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Количество постов',
+        default=0,
+        editable=False,
+    )
 
     def __str__(self):
         return self.title
@@ -55,6 +60,11 @@ class Post(models.Model):
         blank=True,
         help_text='Загрузите картинку',
     )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Количество комментариев',
+        default=0,
+        editable=False,
+    )
 
     def __str__(self):
         return self.text[:POST_OBJECT_NAME_LENGHT]
@@ -63,6 +73,21 @@ class Post(models.Model):
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Индексы под каждую ленту: главная, группа, профиль.
+        # id в конце нужен курсорной пагинации по (pub_date, id).
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+        ]
 
 
 class Comment(models.Model):
@@ -94,6 +119,12 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -119,3 +150,89 @@ class Follow(models.Model):
                 fields=['author', 'user'], name="unique_following"
             )
         ]
+        # Уникальное ограничение начинается с author и не подходит
+        # для поиска подписок читателя
+        indexes = [
+            models.Index(
+                fields=['user', 'author'], name='follow_user_author_idx'
+            ),
+        ]
+
+
+class Profile(models.Model):
+    """Профиль автора с заранее посчитанными счётчиками.
+
+    Значения поддерживаются сигналами (posts.signals), чтобы страницы
+    не выполняли COUNT(*); расхождения исправляет команда
+    manage.py recount_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='profile',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Количество постов', default=0)
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Количество комментариев', default=0)
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков', default=0)
+    following_count = models.PositiveIntegerField(
+        verbose_name='Количество подписок', default=0)
+
+    def __str__(self):
+        return str(self.user)
+
+    class Meta:
+        verbose_name = 'Профиль автора'
+        verbose_name_plural = 'Профили авторов'
+
+
+class TimelineEntry(models.Model):
+    """Запись ленты подписок читателя (fan-out on write).
+
+    Строки добавляются при публикации поста для всех подписчиков
+    автора, поэтому лента /follow/ читается по одному индексу
+    (user, pub_date) без соединения с таблицей подписок.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    # Автор и дата продублированы из поста, чтобы отписка
+    # и сортировка не требовали соединения с posts_post
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_feed_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'], name='timeline_user_author_idx'
+            ),
+        ]
@@ -0,0 +1,211 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .estimates import estimated_count
+
+# Курсорная (keyset) пагинация: вместо OFFSET и COUNT(*) следующая
+# страница выбирается условием по паре (дата, id) последней записи,
+# поэтому время выборки не зависит от глубины страницы.
+
+CURSOR_SEPARATOR = '|'
+
+
+class CountedPaginator(Paginator):
+    """Paginator, которому общее число записей можно передать готовым.
+
+    Счётчики из posts.counters избавляют от COUNT(*) по ленте; с
+    count_key длинная лента считается приблизительно
+    (posts.estimates). Без count и count_key поведение не отличается
+    от Paginator.
+    """
+
+    def __init__(self, object_list, per_page, count=None, count_key=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+        if count is not None:
+            # Paginator.count - cached_property, заполняем кеш заранее
+            self.__dict__['count'] = count
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return super().count
+        return estimated_count(self.object_list, self.count_key)
+
+    # Перенесено из Django 3.2: ссылки на первые и последние страницы
+    # и окно вокруг текущей вместо всего page_range
+    ELLIPSIS = '…'
+
+    def get_elided_page_range(self, number=1, *, on_each_side=3,
+                              on_ends=2):
+        """Номера страниц для ссылок, пропуски - ELLIPSIS.
+
+        Генератор не строит page_range целиком, поэтому число ссылок
+        не зависит от числа страниц.
+        """
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < (self.num_pages - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+
+def encode_cursor(value, pk):
+    """Кодирует позицию записи в непрозрачный токен для URL."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = f'{value}{CURSOR_SEPARATOR}{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает пару (дата, id) или None для испорченного токена."""
+    if not token:
+        return None
+    try:
+        padding = '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(token + padding).decode()
+        value, pk = raw.rsplit(CURSOR_SEPARATOR, 1)
+        value = parse_datetime(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+class CursorPage:
+    """Страница курсорной пагинации.
+
+    Повторяет ту часть интерфейса django.core.paginator.Page,
+    которой пользуются шаблоны, но ничего не знает об общем
+    количестве записей и номерах страниц.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        # Используется как ключ кеша фрагментов ({% cache ... page_obj %}),
+        # поэтому должен отличаться для разных позиций в ленте.
+        return f'<CursorPage {self.previous_cursor}:{self.next_cursor}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Пагинатор по ключу (ordering_field, tiebreaker) по убыванию.
+
+    Выборка каждой страницы - один запрос с LIMIT per_page + 1:
+    лишняя запись только показывает, есть ли страница дальше.
+    Оба поля ключа должны быть доступны как атрибуты объектов
+    (поля модели или аннотации queryset).
+    """
+
+    def __init__(self, queryset, per_page, ordering_field='pub_date',
+                 tiebreaker='pk'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering_field = ordering_field
+        self.tiebreaker = tiebreaker
+
+    def _position(self, obj):
+        return encode_cursor(
+            getattr(obj, self.ordering_field),
+            getattr(obj, self.tiebreaker),
+        )
+
+    def _ordered(self, descending=True):
+        sign = '-' if descending else ''
+        return self.queryset.order_by(
+            f'{sign}{self.ordering_field}', f'{sign}{self.tiebreaker}')
+
+    def _after(self, position):
+        value, pk = position
+        field, tiebreaker = self.ordering_field, self.tiebreaker
+        return self._ordered().filter(
+            Q(**{f'{field}__lt': value})
+            | Q(**{field: value, f'{tiebreaker}__lt': pk})
+        )
+
+    def _before(self, position):
+        value, pk = position
+        field, tiebreaker = self.ordering_field, self.tiebreaker
+        return self._ordered(descending=False).filter(
+            Q(**{f'{field}__gt': value})
+            | Q(**{field: value, f'{tiebreaker}__gt': pk})
+        )
+
+    def get_page(self, after=None, before=None):
+        """Возвращает страницу после курсора after или перед before.
+
+        Без курсора (или с испорченным токеном) отдаётся первая
+        страница, как это делает Paginator.get_page.
+        """
+        after_position = decode_cursor(after)
+        before_position = decode_cursor(before)
+        limit = self.per_page + 1
+        if before_position is not None:
+            rows = list(self._before(before_position)[:limit])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            if not has_more:
+                # Дошли до начала ленты - показываем полную первую
+                # страницу, а не её хвост.
+                return self.get_page()
+            next_cursor = self._position(rows[-1]) if rows else None
+            previous_cursor = self._position(rows[0])
+            return CursorPage(rows, self, next_cursor, previous_cursor)
+        if after_position is not None:
+            queryset = self._after(after_position)
+        else:
+            queryset = self._ordered()
+        rows = list(queryset[:limit])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        next_cursor = self._position(rows[-1]) if has_more else None
+        previous_cursor = None
+        if after_position is not None and rows:
+            previous_cursor = self._position(rows[0])
+        return CursorPage(rows, self, next_cursor, previous_cursor)
@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.paginator import Page
+from django.db import connection
+
+from core import metrics
+
+from .cards import render_cards
+from .pagination import CursorPage, CursorPaginator
+from .versions import get_versions
+
+# Следующая страница ленты готовится заранее: после ответа со
+# страницей N фоновый поток выбирает страницу N+1, отрисовывает её
+# карточки (кеш posts.cards) и кладёт id её постов в кеш на
+# PREFETCH_SECONDS. Запрос страницы N+1 берёт готовый список вместо
+# выборки со смещением: посты выбираются заново по id, поэтому правки
+# и переименования авторов и групп видны сразу. Список сверяется с
+# версией ленты ('feed', ключ ленты) или переданными версиями scopes,
+# так что публикация и удаление поста в ленте его отменяют.
+# Готовые и использованные страницы считают метрики prefetch_pages и
+# prefetch_hits.
+
+PREFETCH_CACHE = 'fragments'
+# Заголовки, которыми браузер помечает запрос <link rel="prefetch">
+PREFETCH_HEADERS = ('HTTP_SEC_PURPOSE', 'HTTP_PURPOSE')
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def page_key(feed_key, paginator, position):
+    mode = 'cursor' if isinstance(paginator, CursorPaginator) else 'page'
+    return f'prefetch:{feed_key}:{mode}:{position}'
+
+
+def feed_version(feed_key, scopes=None):
+    pairs = scopes or [('feed', feed_key)]
+    versions = get_versions(pairs)
+    return ':'.join(versions[pair] for pair in pairs)
+
+
+def is_prefetch_request(request):
+    # Страница, которую браузер запросил по подсказке, сама следующую
+    # не готовит: иначе лента выбиралась бы цепочкой до конца
+    return any(
+        'prefetch' in request.META.get(header, '')
+        for header in PREFETCH_HEADERS
+    )
+
+
+def take_page(paginator, feed_key, position, scopes=None):
+    """Заранее подготовленная страница или None."""
+    if not settings.PREFETCH_SECONDS or not position:
+        return None
+    data = caches[PREFETCH_CACHE].get(
+        page_key(feed_key, paginator, position))
+    if data is None or data['version'] != feed_version(feed_key, scopes):
+        return None
+    if isinstance(paginator, CursorPaginator):
+        rows = select_rows(paginator.queryset, data['ids'])
+        page = CursorPage(rows, paginator, data['next'], data['previous'])
+    elif data['number'] > paginator.num_pages:
+        # Лента стала короче, чем при подготовке страницы
+        return None
+    else:
+        rows = select_rows(paginator.object_list, data['ids'])
+        page = Page(rows, data['number'], paginator)
+    metrics.add('prefetch_hits')
+    return page
+
+
+def select_rows(queryset, ids):
+    """Посты ids из queryset ленты в порядке ids."""
+    found = {post.pk: post for post in queryset.filter(pk__in=ids)}
+    return [found[pk] for pk in ids if pk in found]
+
+
+def prepare(paginator, feed_key, position, version, in_thread=False):
+    """Выбирает страницу, отрисовывает карточки и кладёт её в кеш."""
+    key = page_key(feed_key, paginator, position)
+    started = time.perf_counter()
+    try:
+        if isinstance(paginator, CursorPaginator):
+            page = paginator.get_page(after=position)
+            data = {'next': page.next_cursor,
+                    'previous': page.previous_cursor}
+        else:
+            page = paginator.get_page(position)
+            data = {'number': page.number}
+        rows = list(page.object_list)
+        data['ids'] = [post.pk for post in rows]
+        data['version'] = version
+        render_cards(rows)
+        caches[PREFETCH_CACHE].set(key, data, settings.PREFETCH_SECONDS)
+        metrics.record_background('prefetch_pages', 1)
+    except Exception:
+        logger.exception('Не удалось подготовить страницу %s', key)
+    finally:
+        metrics.record_background(
+            'prefetch_seconds', time.perf_counter() - started)
+        with _pending_lock:
+            _pending.discard(key)
+        if in_thread:
+            connection.close()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PREFETCH_WORKERS,
+                thread_name_prefix='prefetch',
+            )
+        return _executor
+
+
+def run_async():
+    # Как и миниатюры: база sqlite в памяти (тесты) не даёт потокам
+    # ждать блокировку, там страница готовится сразу
+    in_memory = getattr(connection, 'is_in_memory_db', lambda: False)()
+    return not in_memory
+
+
+def schedule_next(request, page, feed_key, scopes=None):
+    """Ставит в очередь подготовку страницы после page."""
+    if (not settings.PREFETCH_SECONDS or not page.has_next()
+            or is_prefetch_request(request)):
+        return
+    paginator = page.paginator
+    if isinstance(paginator, CursorPaginator):
+        position = page.next_cursor
+    else:
+        position = page.next_page_number()
+    key = page_key(feed_key, paginator, position)
+    version = feed_version(feed_key, scopes)
+    ready = caches[PREFETCH_CACHE].get(key)
+    if ready is not None and ready['version'] == version:
+        return
+    with _pending_lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+    if run_async():
+        get_executor().submit(
+            prepare, paginator, feed_key, position, version, True)
+    else:
+        prepare(paginator, feed_key, position, version)
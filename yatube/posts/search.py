@@ -0,0 +1,63 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+# Полнотекстовый поиск по Post.text. На sqlite используется виртуальная
+# таблица FTS5 posts_post_fts, на PostgreSQL - GIN-индекс по
+# to_tsvector('russian', text); обе синхронизирует сама база
+# (триггеры и выражение индекса, миграция 0010_post_search).
+
+FTS_TABLE = 'posts_post_fts'
+PG_VECTOR = "to_tsvector('russian', posts_post.text)"
+PG_QUERY = "plainto_tsquery('russian', %s)"
+
+
+def fts_query(query):
+    """Запрос FTS5: каждое слово в кавычках и с поиском по префиксу."""
+    terms = re.findall(r'\w+', query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_filter(query):
+    """Условие отбора найденных постов, пригодное для любого queryset."""
+    if connection.vendor == 'sqlite':
+        return Q(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [fts_query(query)],
+        ))
+    if connection.vendor == 'postgresql':
+        return Q(pk__in=RawSQL(
+            f'SELECT id FROM posts_post WHERE {PG_VECTOR} @@ {PG_QUERY}',
+            [query],
+        ))
+    return Q(text__icontains=query)
+
+
+def search_posts(query):
+    """Найденные посты, самые релевантные первыми."""
+    if not re.search(r'\w', query):
+        return Post.objects.none()
+    if connection.vendor == 'sqlite':
+        return Post.objects.extra(
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE}.rowid = posts_post.id',
+                f'{FTS_TABLE} MATCH %s',
+            ],
+            params=[fts_query(query)],
+            select={'rank': f'{FTS_TABLE}.rank'},
+            order_by=['rank', '-pub_date'],
+        )
+    if connection.vendor == 'postgresql':
+        return Post.objects.extra(
+            where=[f'{PG_VECTOR} @@ {PG_QUERY}'],
+            params=[query],
+            select={'rank': f'ts_rank({PG_VECTOR}, {PG_QUERY})'},
+            select_params=[query],
+            order_by=['-rank', '-pub_date'],
+        )
+    return Post.objects.filter(search_filter(query))
@@ -0,0 +1,127 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import conditional, counters, follows, timeline
+from .versions import bump
+from .models import Comment, Follow, Group, Post, Profile
+
+User = get_user_model()
+
+# Поля пользователя, которые видны на страницах
+USER_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # Исходная группа нужна, чтобы при смене группы поправить
+    # счётчики обеих; __dict__ не подгружает отложенное поле
+    instance._initial_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_profile(instance.author_id, 'posts_count', 1)
+        counters.change(Group, instance.group_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+    elif instance.group_id != instance._initial_group_id:
+        counters.change(Group, instance._initial_group_id, 'posts_count', -1)
+        counters.change(Group, instance.group_id, 'posts_count', 1)
+        if instance._initial_group_id is not None:
+            bump(*conditional.feed_scope(
+                'group', instance._initial_group_id))
+    instance._initial_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_profile(instance.author_id, 'posts_count', -1)
+    counters.change(Group, instance.group_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_profile(instance.author_id, 'comments_count', 1)
+        counters.change(Post, instance.post_id, 'comments_count', 1)
+        bump('comments', instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_profile(instance.author_id, 'comments_count', -1)
+    counters.change(Post, instance.post_id, 'comments_count', -1)
+    bump('comments', instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_profile(instance.author_id, 'followers_count', 1)
+        counters.change_profile(instance.user_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        timeline.bump_timelines([instance.user_id])
+        follows.forget_state(instance.user_id, instance.author_id)
+        bump('following', instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_profile(instance.author_id, 'followers_count', -1)
+    counters.change_profile(instance.user_id, 'following_count', -1)
+    timeline.remove_author(instance.user_id, instance.author_id)
+    timeline.bump_timelines([instance.user_id])
+    timeline.restore_author(instance.author_id)
+    follows.forget_state(instance.user_id, instance.author_id)
+    bump('following', instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    conditional.bump_post_pages(
+        instance.pk, instance.author_id, instance.group_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump('group', instance.pk)
+    bump(*conditional.NAMES)
+
+
+@receiver(post_init, sender=User)
+def remember_names(sender, instance, **kwargs):
+    # Отложенное поле даёт None, и сохранение считается сменой имени
+    instance._initial_names = user_names(instance)
+
+
+def user_names(user):
+    return tuple(user.__dict__.get(field) for field in USER_NAME_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    # Новый пользователь ещё не показан ни на одной странице, а вход,
+    # смена пароля и почты не меняют видимых в лентах имён
+    names = user_names(instance)
+    changed = names != instance._initial_names
+    instance._initial_names = names
+    if created or not changed:
+        return
+    user_changed(sender, instance)
+
+
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    bump('user', instance.pk)
+    bump(*conditional.NAMES)
@@ -0,0 +1,23 @@
+from django import template
+
+from posts.follows import followed_authors
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def follow_states(context, posts):
+    """Id авторов страницы, на которых подписан читатель."""
+    return followed_authors(
+        context['request'], {post.author_id for post in posts})
+
+
+@register.inclusion_tag('includes/follow_button.html', takes_context=True)
+def follow_button(context, author, followed):
+    """Кнопка подписки на автора, если это не сам читатель."""
+    user = context['request'].user
+    return {
+        'author': author,
+        'following': author.pk in followed,
+        'show': user.is_authenticated and user.pk != author.pk,
+    }
@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Пары (пост, карточка) для цикла по странице ленты."""
+    return [(post, mark_safe(card)) for post, card in render_cards(posts)]
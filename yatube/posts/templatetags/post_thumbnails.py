@@ -0,0 +1,11 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(post, geometry_string, **options):
+    """Готовая миниатюра картинки поста или None."""
+    return thumbnails.ready_thumbnail(post, geometry_string, **options)
@@ -0,0 +1,193 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.imports import Importer
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry,
+                          User)
+
+
+class BenchCommandsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_data', users=5, groups=2, posts=30, comments=20,
+            follows=10, stdout=StringIO())
+
+    def test_seed_data(self):
+        """seed_data создаёт данные и пересчитывает счётчики и ленты."""
+        self.assertEqual(Group.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 20)
+        self.assertTrue(Follow.objects.exists())
+        group = Group.objects.first()
+        self.assertEqual(group.posts_count, group.posts.count())
+        follow = Follow.objects.first()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=follow.user, author=follow.author).exists())
+
+    def test_bench_views_compare(self):
+        """bench_views сохраняет прогон и сообщает о регрессиях."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.json')
+            call_command(
+                'bench_views', repeat=2, save=path, stdout=StringIO())
+            with open(path) as file:
+                results = json.load(file)
+            self.assertIn('index', results)
+            self.assertIn('p99_ms', results['index'])
+            for result in results.values():
+                result['queries'] = 0
+            with open(path, 'w') as file:
+                json.dump(results, file)
+            with self.assertRaisesMessage(CommandError, 'queries'):
+                call_command(
+                    'bench_views', repeat=2, compare=path, stdout=StringIO())
+
+
+class ImportContentTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание')
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+        return path
+
+    def test_import_jsonl(self):
+        """Посты, комментарии и подписки загружаются с пересчётом."""
+        records = [
+            {'type': 'post', 'id': 100, 'author': 'anna',
+             'group': 'test-slug', 'text': 'Первый',
+             'pub_date': '2020-01-01T10:00:00'},
+            {'type': 'post', 'id': 101, 'author': 'anna', 'text': 'Второй'},
+            {'type': 'comment', 'post': 100, 'author': 'boris',
+             'text': 'Комментарий'},
+            {'type': 'comment', 'post': 999, 'author': 'boris',
+             'text': 'К несуществующему посту'},
+            {'type': 'follow', 'user': 'boris', 'author': 'anna'},
+            {'type': 'post', 'author': 'anna', 'group': 'nope', 'text': 'x'},
+        ]
+        path = self.write(
+            'content.jsonl', [json.dumps(record) for record in records])
+        stderr = StringIO()
+        call_command(
+            'import_content', path, create_users=True, chunk_size=2,
+            stdout=StringIO(), stderr=stderr)
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.author.username, 'anna')
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Post.objects.count(), 2)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(post.author.profile.posts_count, 2)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user__username='boris').count(), 2)
+        self.assertIn('строка 4: нет поста 999', stderr.getvalue())
+        self.assertIn("неизвестная группа 'nope'", stderr.getvalue())
+        self.assertFalse(os.path.exists(path + '.progress'))
+
+    def test_import_csv_resume(self):
+        """CSV с --type; загрузка продолжается с контрольной точки."""
+        path = self.write('posts.csv', [
+            'id,author,text',
+            '1,anna,Уже загружен',
+            '2,anna,Новый',
+        ])
+        with open(path + '.progress', 'w') as file:
+            file.write('1')
+        call_command(
+            'import_content', path, type='post', create_users=True,
+            resume=True, stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.values_list('pk', 'text')), [(2, 'Новый')])
+
+    def test_repeated_records_not_counted(self):
+        """Уже загруженные посты и подписки не попадают в итоги."""
+        path = self.write('content.jsonl', [json.dumps(record) for record in (
+            {'type': 'post', 'id': 100, 'author': 'anna', 'text': 'Пост'},
+            {'type': 'follow', 'user': 'boris', 'author': 'anna'},
+        )])
+        call_command(
+            'import_content', path, create_users=True, stdout=StringIO())
+        stdout = StringIO()
+        call_command(
+            'import_content', path, create_users=True, stdout=stdout)
+        self.assertIn('post: 0', stdout.getvalue())
+        self.assertIn('follow: 0', stdout.getvalue())
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_resume_rebuilds_earlier_timelines(self):
+        """Продолжение пересобирает ленты из порций до сбоя."""
+        path = self.write('content.jsonl', [json.dumps(record) for record in (
+            {'type': 'post', 'author': 'anna', 'text': 'Первый'},
+            {'type': 'follow', 'user': 'boris', 'author': 'anna'},
+            {'type': 'post', 'author': 'vera', 'text': 'Второй'},
+        )])
+        import_chunk = Importer.import_chunk
+
+        def crash_on_third(importer, records, first_line):
+            if first_line == 3:
+                raise KeyboardInterrupt
+            import_chunk(importer, records, first_line)
+
+        with mock.patch.object(Importer, 'import_chunk', crash_on_third):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command(
+                    'import_content', path, create_users=True,
+                    chunk_size=1, stdout=StringIO())
+        call_command(
+            'import_content', path, create_users=True, chunk_size=1,
+            resume=True, stdout=StringIO())
+        self.assertEqual(
+            TimelineEntry.objects.filter(user__username='boris').count(), 1)
+        self.assertFalse(os.path.exists(path + '.progress'))
+
+    def test_import_changes_page_etags(self):
+        """Загрузка в обход сигналов меняет ETag лент."""
+        author = User.objects.create_user(username='anna')
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[author.username]),
+        )
+        client = Client()
+        before = [client.get(url)['ETag'] for url in urls]
+        path = self.write('posts.jsonl', [json.dumps(
+            {'author': 'anna', 'group': 'test-slug', 'text': 'Загружен'})])
+        call_command(
+            'import_content', path, type='post', stdout=StringIO())
+        for url, etag in zip(urls, before):
+            with self.subTest(url=url):
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, 'Загружен')
+
+    @mock.patch('posts.conditional.BUMP_LIMIT', 0)
+    def test_large_import_changes_all_etags(self):
+        """Большая загрузка меняет общую версию вместо версий по одной."""
+        self.test_import_changes_page_etags()
+
+    def test_unknown_user(self):
+        """Без --create-users неизвестные авторы - ошибка записи."""
+        path = self.write('posts.jsonl', [
+            json.dumps({'author': 'ghost', 'text': 'Текст'})])
+        stderr = StringIO()
+        call_command(
+            'import_content', path, type='post', stdout=StringIO(),
+            stderr=stderr)
+        self.assertFalse(Post.objects.exists())
+        self.assertIn("неизвестный пользователь 'ghost'", stderr.getvalue())
@@ -0,0 +1,165 @@
+from http import HTTPStatus
+
+from django.core.cache import caches
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import follows
+from posts.models import Comment, Group, Post, User
+
+INDEX = reverse('posts:index')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Тестовый пост')
+        cls.urls = (
+            INDEX,
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.author.username]),
+            reverse('posts:post_detail', args=[cls.post.pk]),
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def etags(self, client=None):
+        client = client or self.guest_client
+        return [client.get(url)['ETag'] for url in self.urls]
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304 без тела."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(response.content, b'')
+
+    def test_cache_control(self):
+        """Анонимные страницы публичные, страницы читателя - частные."""
+        response = self.guest_client.get(INDEX)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('s-maxage', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        response = self.reader_client.get(INDEX)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotEqual(response['ETag'], self.guest_client.get(
+            INDEX)['ETag'])
+
+    def test_post_changes(self):
+        """Правка поста меняет ETag всех страниц, где он показан."""
+        before = self.etags()
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        for url, old, new in zip(self.urls, before, self.etags()):
+            with self.subTest(url=url):
+                self.assertNotEqual(old, new)
+
+    def test_comment_changes_post_page(self):
+        before = self.etags()
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        after = self.etags()
+        self.assertEqual(before[:3], after[:3])
+        self.assertNotEqual(before[3], after[3])
+
+    def test_names_and_logins(self):
+        """Имя автора меняет ETag, а вход, регистрация и почта - нет."""
+        before = self.etags()
+        Client().force_login(self.author)
+        User.objects.create_user(username='newcomer')
+        self.author.email = 'author@example.com'
+        self.author.save()
+        self.assertEqual(before, self.etags())
+        self.author.first_name = 'Лев'
+        self.author.save()
+        for old, new in zip(before, self.etags()):
+            self.assertNotEqual(old, new)
+
+    def test_follow_changes_reader_pages(self):
+        before = self.etags(self.reader_client)
+        follows.follow(self.reader, self.author.pk)
+        for old, new in zip(before, self.etags(self.reader_client)):
+            self.assertNotEqual(old, new)
+
+    def test_missing_objects(self):
+        for url in (reverse('posts:group_list', args=['missing']),
+                    reverse('posts:profile', args=['missing']),
+                    reverse('posts:post_detail', args=[0])):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug')
+        cls.other_group = Group.objects.create(
+            title='Другая группа', slug='other_slug')
+        Post.objects.create(
+            author=cls.author, group=cls.group, text='Тестовый пост')
+        cls.other_author = User.objects.create_user(username='other')
+        Post.objects.create(
+            author=cls.other_author, group=cls.other_group,
+            text='Другой пост')
+
+    def setUp(self):
+        caches['pages'].clear()
+        self.guest_client = Client()
+
+    def cached(self, url, client=None):
+        """Страница отдана из кеша: шаблоны не отрисовывались."""
+        response = (client or self.guest_client).get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return not response.templates
+
+    def test_anonymous_pages_cached(self):
+        self.assertFalse(self.cached(INDEX))
+        with self.assertNumQueries(0):
+            self.assertTrue(self.cached(INDEX))
+        self.assertFalse(self.cached(INDEX + '?page=2'))
+        response = self.guest_client.get(
+            INDEX, HTTP_IF_NONE_MATCH=self.guest_client.get(INDEX)['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_session_bypasses_cache(self):
+        client = Client()
+        client.force_login(self.author)
+        self.cached(INDEX, client)
+        self.assertFalse(self.cached(INDEX, client))
+
+    def test_new_post_purges_its_feeds(self):
+        """Новый пост вытесняет только ленты, в которых он показан."""
+        urls = {
+            'index': INDEX,
+            'group': reverse('posts:group_list', args=[self.group.slug]),
+            'profile': reverse('posts:profile', args=[self.author.username]),
+            'other_group': reverse(
+                'posts:group_list', args=[self.other_group.slug]),
+            'other_profile': reverse(
+                'posts:profile', args=[self.other_author.username]),
+        }
+        for url in urls.values():
+            self.cached(url)
+        Post.objects.create(
+            author=self.author, group=self.group, text='Новый пост')
+        for name, url in urls.items():
+            with self.subTest(page=name):
+                self.assertEqual(
+                    self.cached(url), name.startswith('other'))
+        self.assertContains(self.guest_client.get(INDEX), 'Новый пост')
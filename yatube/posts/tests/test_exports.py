@@ -0,0 +1,103 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.admin = User.objects.create_user(username='admin', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Пост в группе')
+        cls.other = Post.objects.create(author=cls.user, text='Без группы')
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+        cls.profile_url = reverse(
+            'posts:profile_export', args=[cls.user.username])
+        cls.group_url = reverse('posts:group_export', args=[cls.group.slug])
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_profile_export_jsonl(self):
+        """Архив автора отдаётся потоком: посты, затем комментарии."""
+        response = self.author_client.get(self.profile_url)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="auth.jsonl"',
+                      response['Content-Disposition'])
+        records = [json.loads(line)
+                   for line in self.read(response).splitlines()]
+        self.assertEqual(
+            [(record['type'], record.get('id')) for record in records],
+            [('post', self.post.pk), ('post', self.other.pk),
+             ('comment', None)])
+        self.assertEqual(records[0]['group'], 'test-slug')
+        self.assertEqual(records[2]['post'], self.post.pk)
+        self.assertEqual(records[2]['author'], 'reader')
+
+    def test_group_export_csv(self):
+        """Архив группы в CSV доступен персоналу."""
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(self.group_url, {'format': 'csv'})
+        rows = list(csv.DictReader(StringIO(self.read(response))))
+        self.assertEqual(
+            [(row['type'], row['text']) for row in rows],
+            [('post', 'Пост в группе'), ('comment', 'Комментарий')])
+
+    def test_export_forbidden(self):
+        """Чужой архив и архив группы недоступны обычным пользователям."""
+        client = Client()
+        client.force_login(self.reader)
+        for url in (self.profile_url, self.group_url):
+            with self.subTest(url=url):
+                self.assertEqual(client.get(url).status_code, 403)
+        response = self.author_client.get(
+            self.profile_url, {'format': 'xml'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_command_stdout(self):
+        """Без --output выгрузка пишется в stdout команды."""
+        stdout = StringIO()
+        call_command('export_content', '--group', 'test-slug', stdout=stdout)
+        records = [json.loads(line)
+                   for line in stdout.getvalue().splitlines()]
+        self.assertEqual(
+            [record['type'] for record in records], ['post', 'comment'])
+
+    def test_export_import_round_trip(self):
+        """Выгрузка команды загружается обратно import_content."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'auth.csv')
+            call_command(
+                'export_content', '--author', 'auth', '--format', 'csv',
+                '--output', path, stderr=StringIO())
+            Post.objects.filter(author=self.user).delete()
+            call_command(
+                'import_content', path, stdout=StringIO(),
+                stderr=StringIO())
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.text, self.post.text)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.pub_date, self.post.pub_date)
+        self.assertEqual(post.comments.get().text, 'Комментарий')
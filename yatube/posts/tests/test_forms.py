@@ -1,11 +1,13 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.models import Comment, Group, Post, User
 
@@ -77,6 +79,46 @@ class PostFormTests(TestCase):
             'posts:profile', kwargs={'username': post.author})
         self.assertRedirects(response, PROFILE_URL)
 
+    def make_jpeg(self, size):
+        """JPEG с EXIF-метаданными для проверки обработки загрузки."""
+        output = BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = 'Test camera'
+        Image.new('RGB', size, 'red').save(
+            output, format='JPEG', quality=100, exif=exif.tobytes())
+        return SimpleUploadedFile(
+            name='photo.jpeg',
+            content=output.getvalue(),
+            content_type='image/jpeg'
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIZE=400, POST_IMAGE_FORMAT='WEBP')
+    def test_post_create_downsamples_image(self):
+        """Большая картинка уменьшается, метаданные удаляются."""
+        form_data = {
+            'text': 'Пост с большой картинкой',
+            'image': self.make_jpeg((1600, 1200)),
+        }
+        self.authorized_client.post(POST_CREATE, data=form_data)
+        post = Post.objects.get(text=form_data['text'])
+        self.assertEqual(post.image.name, 'posts/photo.webp')
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.format, 'WEBP')
+            self.assertEqual(stored.size, (400, 300))
+            self.assertFalse(stored.getexif())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100 * 100)
+    def test_post_create_rejects_huge_image(self):
+        """Картинка больше лимита пикселей не принимается."""
+        posts_count = Post.objects.count()
+        form_data = {
+            'text': 'Пост с огромной картинкой',
+            'image': self.make_jpeg((200, 200)),
+        }
+        response = self.authorized_client.post(POST_CREATE, data=form_data)
+        self.assertEqual(Post.objects.count(), posts_count)
+        self.assertTrue(response.context['form'].errors['image'])
+
     def test_post_edit(self):
         """Редактирование записи в Post."""
         post = Post.objects.create(
@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from posts.models import Post
+
+User = get_user_model()
+
+INDEX = reverse('posts:index')
+METRICS = reverse('metrics')
+
+
+# Готовые страницы из кеша обошли бы замеряемые шаблоны и карточки
+@override_settings(PAGE_CACHE_SECONDS=0)
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        self.guest_client = Client()
+        caches['fragments'].clear()
+        metrics.reset()
+
+    def test_server_timing(self):
+        """Ответ содержит Server-Timing с SQL, шаблонами и кешем."""
+        response = self.guest_client.get(INDEX)
+        header = response['Server-Timing']
+        for part in ('db;dur=', 'tpl;dur=', 'cache;desc="hit 0 miss 1"',
+                     'total;dur='):
+            with self.subTest(part=part):
+                self.assertIn(part, header)
+        response = self.guest_client.get(INDEX)
+        self.assertIn('cache;desc="hit 1 miss 0"', response['Server-Timing'])
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+    def test_metrics_endpoint(self):
+        """Итоги по представлениям отдаются в формате Prometheus."""
+        self.guest_client.get(INDEX)
+        self.guest_client.get(INDEX)
+        response = self.guest_client.get(METRICS)
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            body)
+        self.assertIn(
+            'yatube_responses_total{view="posts:index",status="2xx"} 2',
+            body)
+        self.assertIn('yatube_sql_queries_total{view="posts:index"}', body)
+        self.assertIn('yatube_cache_hits_total{view="posts:index"} 1.0', body)
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+    def test_metrics_endpoint_forbidden(self):
+        """Итоги недоступны с посторонних адресов."""
+        response = self.guest_client.get(METRICS, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_metrics_endpoint_staff_only_by_default(self):
+        """Без списка адресов итоги видят только сотрудники."""
+        response = self.guest_client.get(METRICS)
+        self.assertEqual(response.status_code, 403)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.guest_client.force_login(staff)
+        response = self.guest_client.get(METRICS)
+        self.assertEqual(response.status_code, 200)
+
+    def test_log_line(self):
+        """Каждый запрос пишет строку лога с замерами."""
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            self.guest_client.get(INDEX)
+        self.assertIn('view=posts:index', logs.output[0])
+        self.assertIn('sql_queries=', logs.output[0])
+
+    def test_slow_request_warning(self):
+        """Медленные запросы попадают в лог с уровнем WARNING."""
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            self.guest_client.get(INDEX)
+        self.assertTrue(logs.output[0].startswith('INFO:'))
+        with override_settings(SLOW_REQUEST_MS=0):
+            with self.assertLogs('core.middleware', 'WARNING') as logs:
+                self.guest_client.get(INDEX)
+        self.assertIn('view=posts:index', logs.output[0])
@@ -1,7 +1,11 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.db.utils import IntegrityError
 from django.test import TestCase
 
-from posts.models import POST_OBJECT_NAME_LENGHT, Follow, Group, Post, User
+from posts.models import (POST_OBJECT_NAME_LENGHT, Comment, Follow, Group,
+                          Post, Profile, User)
 
 
 class PostModelTest(TestCase):
@@ -73,3 +77,65 @@ class FollowModelTests(TestCase):
         with self.assertRaises(Exception) as raised:
             subscrition_copy.save()
         self.assertEqual(IntegrityError, type(raised.exception))
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание группы',
+        )
+        cls.second_group = Group.objects.create(
+            title='Вторая группа',
+            slug='second_slug',
+            description='Тестовое описание группы',
+        )
+
+    def assertCounters(self, obj, **expected):
+        obj.refresh_from_db()
+        for field, value in expected.items():
+            with self.subTest(obj=obj, field=field):
+                self.assertEqual(getattr(obj, field), value)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(
+            author=self.author, text='Текст', group=self.group)
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий')
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertCounters(
+            self.author.profile, posts_count=1, followers_count=1)
+        self.assertCounters(
+            self.user.profile, comments_count=1, following_count=1)
+        self.assertCounters(self.group, posts_count=1)
+        self.assertCounters(post, comments_count=1)
+        post.group = self.second_group
+        post.save()
+        self.assertCounters(self.group, posts_count=0)
+        self.assertCounters(self.second_group, posts_count=1)
+        comment.delete()
+        follow.delete()
+        post.delete()
+        self.assertCounters(
+            self.author.profile, posts_count=0, followers_count=0)
+        self.assertCounters(
+            self.user.profile, comments_count=0, following_count=0)
+        self.assertCounters(self.second_group, posts_count=0)
+
+    def test_recount_command_repairs_drift(self):
+        """Команда recount_counters исправляет расхождения."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text='Текст', group=self.group)
+            for _ in range(3)
+        )
+        Profile.objects.filter(user=self.user).delete()
+        call_command('recount_counters', stdout=StringIO())
+        self.assertCounters(self.author.profile, posts_count=3)
+        self.assertCounters(self.group, posts_count=3)
+        self.assertTrue(Profile.objects.filter(user=self.user).exists())
@@ -0,0 +1,56 @@
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.db_router import REPLICA_ALIAS, use_replica
+from posts.models import Post, User
+
+INDEX = reverse('posts:index')
+
+
+@override_settings(REPLICA_READS=True)
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {DEFAULT_DB_ALIAS, REPLICA_ALIAS}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=self.user, text='Тестовый пост')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary:
+            with CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica:
+                response = self.client.get(url)
+        return response, len(primary), len(replica)
+
+    def test_router(self):
+        """Реплика читается только внутри use_replica и вне транзакции."""
+        self.assertEqual(Post.objects.all().db, DEFAULT_DB_ALIAS)
+        with use_replica():
+            self.assertEqual(Post.objects.all().db, REPLICA_ALIAS)
+            with transaction.atomic():
+                self.assertEqual(Post.objects.all().db, DEFAULT_DB_ALIAS)
+        with override_settings(REPLICA_READS=False), use_replica():
+            self.assertEqual(Post.objects.all().db, DEFAULT_DB_ALIAS)
+
+    def test_feed_reads_replica(self):
+        """Лента читается из реплики, основная база не запрашивается."""
+        response, primary, replica = self.get(INDEX)
+        self.assertContains(response, 'Тестовый пост')
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_reads_stick_to_primary_after_write(self):
+        """После публикации клиент читает из основной базы."""
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'})
+        self.assertIn('db_primary_until', response.cookies)
+        response, primary, replica = self.get(INDEX)
+        self.assertContains(response, 'Новый пост')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+        self.client.cookies['db_primary_until'] = '0'
+        response, primary, replica = self.get(INDEX)
+        self.assertEqual(primary, 0)
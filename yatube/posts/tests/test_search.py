@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from posts.search import search_posts
+
+User = get_user_model()
+
+SEARCH = reverse('posts:search')
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.relevant = Post.objects.create(
+            author=cls.user, text='Кошки, кошки и ещё раз кошки')
+        cls.mentioned = Post.objects.create(
+            author=cls.user, text='Собаки лучше, чем кошки, и это факт')
+        cls.other = Post.objects.create(
+            author=cls.user, text='Совсем про другое')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_search_ranked(self):
+        """Поиск находит посты по словам и ранжирует их."""
+        self.assertEqual(
+            list(search_posts('кошки')), [self.relevant, self.mentioned])
+        self.assertEqual(list(search_posts('КОШКИ собаки')), [self.mentioned])
+        self.assertEqual(list(search_posts('!!!')), [])
+
+    def test_search_index_in_sync(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        other = Post.objects.get(pk=self.other.pk)
+        other.text = 'Теперь и тут кошки'
+        other.save()
+        self.assertIn(other, search_posts('кошки'))
+        self.assertNotIn(other, search_posts('другое'))
+        Post.objects.get(pk=self.relevant.pk).delete()
+        self.assertNotIn(self.relevant, search_posts('кошки'))
+
+    def test_search_view(self):
+        """Страница поиска показывает найденные посты."""
+        response = self.guest_client.get(SEARCH, {'q': 'собаки'})
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(list(response.context['page_obj']), [self.mentioned])
+        response = self.guest_client.get(SEARCH)
+        self.assertNotContains(response, 'Ничего не найдено')
+
+    @override_settings(COUNT_EXACT_LIMIT=1)
+    @mock.patch('posts.estimates.schedule_refresh')
+    def test_search_count_capped(self, schedule_refresh):
+        """Результаты поиска считаются до предела, без фоновых подсчётов."""
+        response = self.guest_client.get(SEARCH, {'q': 'кошки'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+        response = self.guest_client.get(SEARCH, {'q': 'собаки'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+        schedule_refresh.assert_not_called()
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через полнотекстовый индекс."""
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собаки'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.mentioned])
@@ -0,0 +1,67 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.db import connections
+from django.test import SimpleTestCase, override_settings
+
+from core.sqlite.base import DatabaseWrapper
+
+
+@override_settings(SQLITE_PROFILE='wal')
+class SqliteBackendTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'db.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def connect(self, **options):
+        settings_dict = {
+            **connections.databases['default'],
+            'NAME': self.path,
+            'OPTIONS': options,
+        }
+        wrapper = DatabaseWrapper(settings_dict, alias='sqlite_test')
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        return wrapper.connection.execute(f'PRAGMA {name}').fetchone()[0]
+
+    def test_profile_pragmas(self):
+        """Новое соединение получает PRAGMA профиля."""
+        wrapper = self.connect()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+        with override_settings(SQLITE_PROFILE='rollback'):
+            wrapper = self.connect()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+
+    def other_writer_blocked(self, transaction_mode):
+        wrapper = self.connect(transaction_mode=transaction_mode)
+        wrapper.set_autocommit(
+            False, force_begin_transaction_with_broken_autocommit=True)
+        other = sqlite3.connect(self.path, timeout=0)
+        try:
+            other.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError:
+            return True
+        finally:
+            other.close()
+            wrapper.rollback()
+            wrapper.set_autocommit(True)
+        return False
+
+    def test_transaction_mode(self):
+        """IMMEDIATE берёт блокировку записи в начале транзакции."""
+        self.assertTrue(self.other_writer_blocked('immediate'))
+        self.assertFalse(self.other_writer_blocked(None))
+
+    def test_invalid_transaction_mode(self):
+        with self.assertRaises(ValueError):
+            self.connect(transaction_mode='LAZY')
@@ -1,15 +1,30 @@
 import shutil
 import tempfile
+import threading
+import time
+from http import HTTPStatus
 
 from django import forms
 from django.conf import settings
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import OperationalError, connection
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Comment, Follow, Group, Post, User
-from posts.views import NUMBER_OF_POSTS
+from core import metrics
+from posts.cards import card_cache_stats
+from posts import follows
+from posts.counters import recount
+from posts.models import (Comment, Follow, Group, Post, Profile,
+                          TimelineEntry, User)
+from posts.estimates import table_statistics
+from posts.pagination import CountedPaginator
+from posts.thumbnails import THUMBNAIL_GEOMETRIES, enqueue
+from posts.timeline import trim
+from posts.views import NUMBER_OF_COMMENTS, NUMBER_OF_POSTS
 
 INDEX = reverse('posts:index')
 POST_CREATE = reverse('posts:post_create')
@@ -68,6 +83,8 @@ class PostViewsTests(TestCase):
             )
         )
         cls.posts_list = Post.objects.bulk_create(posts_list)
+        # bulk_create не вызывает сигналы - счётчики пересчитываем
+        recount()
         # Экземпляр последнего поста для тестов
         cls.post = Post.objects.latest('pub_date')
         # URLs для тестов с аргументами
@@ -160,6 +177,32 @@ class PostViewsTests(TestCase):
                     self.assertEqual(
                         len(page.object_list), page_info['count'])
 
+    def test_pages_without_count_queries(self):
+        """Группа, профиль и пост берут количество из счётчиков."""
+        for url in (self.GROUP_LIST, self.PROFILE, self.POST_DETAIL):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as context:
+                    self.authorized_client.get(url)
+                for query in context.captured_queries:
+                    self.assertNotIn('COUNT(', query['sql'].upper())
+
+    @override_settings(THUMBNAIL_ASYNC=False)
+    def test_thumbnail_placeholder_until_generated(self):
+        """Пока миниатюра не создана, шаблоны показывают заглушку."""
+        thumbnail_html = '<img class="card-img my-2"'
+        for url in (INDEX, self.POST_DETAIL):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertNotContains(response, thumbnail_html)
+                self.assertContains(response, 'aspect-ratio: 960 / 339')
+        for geometry_string, options in THUMBNAIL_GEOMETRIES:
+            enqueue(self.post.pk, self.post.image.name,
+                    geometry_string, options)
+        for url in (INDEX, self.POST_DETAIL):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, thumbnail_html)
+
     def test_post_detail_correct_context(self):
         """Шаблон post_detail.html. Проверка контекста"""
         response = self.authorized_client.get(self.POST_DETAIL)
@@ -221,22 +264,108 @@ class PostViewsTests(TestCase):
             page = responce.context.get('page_obj')
             self.assertNotIn(post_no_group, page)
 
+    @override_settings(PAGE_CACHE_SECONDS=0)
     def test_cache_index(self):
-        """Проверка кеширования главной страницы.
+        """Проверка кеширования карточек постов.
+           Карточка берётся из кеша, пока пост не изменён,
+           правки и удаление видны сразу.
         """
         post_new = Post.objects.create(
             author=self.user,
             text='Post for cache test',
         )
         response_first = self.guest_client.get(INDEX)
-        post_new_text_bytes = bytes(post_new.text, 'UTF-8')
-        self.assertIn(post_new_text_bytes, response_first.content)
-        post_new.delete()
+        self.assertContains(response_first, post_new.text)
+        # update() не вызывает сигналы: версия карточки прежняя
+        Post.objects.filter(id=post_new.id).update(text='Changed silently')
+        stats_before = card_cache_stats()
         response_second = self.guest_client.get(INDEX)
         self.assertEqual(response_first.content, response_second.content)
-        cache.clear()
+        self.assertGreater(card_cache_stats()['hits'], stats_before['hits'])
+        post_new.text = 'Edited post'
+        post_new.save()
         response_third = self.guest_client.get(INDEX)
-        self.assertNotEqual(response_first.content, response_third.content)
+        self.assertContains(response_third, 'Edited post')
+        post_new.delete()
+        response_fourth = self.guest_client.get(INDEX)
+        self.assertNotContains(response_fourth, 'Edited post')
+
+    def test_card_cache_follows_group_and_author(self):
+        """Изменение группы или автора обновляет карточки во всех лентах."""
+        for url in (INDEX, self.GROUP_LIST, self.PROFILE, FOLLOW_INDEX):
+            self.authorized_client.get(url)
+        self.group.slug = 'renamed_slug'
+        self.group.save()
+        self.user.first_name = 'Переименованный'
+        self.user.save()
+        try:
+            response = self.guest_client.get(INDEX)
+            self.assertContains(response, 'renamed_slug')
+            self.assertContains(response, 'Переименованный')
+        finally:
+            self.group.slug = 'test_slug'
+            self.group.save()
+            self.user.first_name = ''
+            self.user.save()
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Текст')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(NUMBER_OF_COMMENTS + 5)
+        )
+        cls.expected = list(
+            cls.post.comments.order_by('-created', '-pk')
+            .values_list('pk', flat=True)
+        )
+        cls.POST_DETAIL = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.id})
+        cls.COMMENTS = reverse(
+            'posts:comments', kwargs={'post_id': cls.post.id})
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_post_detail_renders_first_comments(self):
+        """Страница поста содержит только новейшие комментарии."""
+        response = self.guest_client.get(self.POST_DETAIL)
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.pk for comment in comments],
+            self.expected[:NUMBER_OF_COMMENTS],
+        )
+        self.assertContains(
+            response, f'{self.COMMENTS}?after={comments.next_cursor}')
+
+    def test_comments_fragment_loads_rest(self):
+        """Фрагмент и JSON отдают следующую порцию по курсору."""
+        first = self.guest_client.get(self.COMMENTS)
+        cursor = first.context['comments'].next_cursor
+        response = self.guest_client.get(self.COMMENTS + f'?after={cursor}')
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertNotContains(response, '<html')
+        self.assertEqual(
+            [comment.pk for comment in response.context['comments']],
+            self.expected[NUMBER_OF_COMMENTS:],
+        )
+        data = self.guest_client.get(
+            self.COMMENTS, {'after': cursor, 'format': 'json'}).json()
+        self.assertEqual(
+            [comment['id'] for comment in data['comments']],
+            self.expected[NUMBER_OF_COMMENTS:],
+        )
+        self.assertIsNone(data['next'])
+
+    def test_comments_fragment_unknown_post(self):
+        """Фрагмент комментариев несуществующего поста - 404."""
+        url = reverse('posts:comments', kwargs={'post_id': 0})
+        response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
 
 
 class FollowViewTests(TestCase):
@@ -289,3 +418,744 @@ class FollowViewTests(TestCase):
         self.assertEqual(post_text, self.post.text)
         response = self.authorized_another_user.get(FOLLOW_INDEX)
         self.assertNotIn(self.post, response.context["page_obj"])
+
+    def test_timeline_fan_out(self):
+        """Подписка переносит посты автора в ленту читателя,
+           новый пост раскладывается подписчикам, отписка их убирает.
+        """
+        self.authorized_user.get(self.FOLLOW)
+        timeline = TimelineEntry.objects.filter(user=self.user)
+        self.assertEqual(
+            list(timeline.values_list('post', flat=True)), [self.post.pk])
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertTrue(timeline.filter(post=new_post).exists())
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.another_user).exists())
+        self.authorized_user.get(self.UNFOLLOW)
+        self.assertFalse(timeline.exists())
+
+    @override_settings(TIMELINE_MAX_LENGTH=2)
+    def test_timeline_trim_keeps_tied_dates(self):
+        """Обрезка оставляет ровно TIMELINE_MAX_LENGTH записей,
+           даже если у поста на границе та же дата, что у соседей.
+        """
+        Follow.objects.create(user=self.user, author=self.author)
+        for text in ('Первый', 'Второй'):
+            Post.objects.create(author=self.author, text=text)
+        timeline = TimelineEntry.objects.filter(user=self.user)
+        timeline.update(pub_date=self.post.pub_date)
+        self.assertEqual(timeline.count(), 3)
+        trim(self.user.pk)
+        self.assertEqual(timeline.count(), 2)
+
+    def test_follow_index_single_timeline_read(self):
+        """Лента подписок читается из материализованной ленты."""
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.authorized_user.get(FOLLOW_INDEX)
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+        # Запись ленты без подписки тоже попадает в выдачу:
+        # чтение не соединяется с таблицей подписок
+        Follow.objects.filter(user=self.user).update(author=self.user)
+        response = self.authorized_user.get(FOLLOW_INDEX)
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_follow_index_popular_author_fan_out_on_read(self):
+        """Посты популярного автора не раскладываются,
+           а подмешиваются в ленту при чтении.
+        """
+        self.authorized_user.get(self.FOLLOW)
+        Post.objects.create(author=self.author, text='Новый')
+        self.assertFalse(TimelineEntry.objects.exists())
+        response = self.authorized_user.get(FOLLOW_INDEX)
+        self.assertEqual(
+            len(response.context['page_obj']),
+            Post.objects.filter(author=self.author).count(),
+        )
+        response = self.authorized_another_user.get(FOLLOW_INDEX)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_back_under_fan_out_limit(self):
+        """Посты, опубликованные сверх лимита, остаются в лентах
+           подписчиков после отписки, вернувшей автора под лимит.
+        """
+        self.authorized_user.get(self.FOLLOW)
+        self.authorized_another_user.get(self.FOLLOW)
+        post = Post.objects.create(author=self.author, text='Новый')
+        self.authorized_another_user.get(self.UNFOLLOW)
+        response = self.authorized_user.get(FOLLOW_INDEX)
+        self.assertIn(post, response.context['page_obj'])
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user, post=post).exists())
+
+    def test_follow_repeated_requests(self):
+        """Повторная подписка и отписка ничего не меняют."""
+        for _ in range(2):
+            self.authorized_user.get(self.FOLLOW)
+        self.assertEqual(
+            Follow.objects.filter(user=self.user, author=self.author).count(),
+            1)
+        self.assertEqual(
+            Profile.objects.get(user=self.author).followers_count, 1)
+        for _ in range(2):
+            self.authorized_user.get(self.UNFOLLOW)
+        self.assertFalse(Follow.objects.exists())
+        profile = Profile.objects.get(user=self.author)
+        self.assertEqual(profile.followers_count, 0)
+
+    def test_follow_toggle(self):
+        """JSON-эндпоинт подписывает по POST и отписывает по DELETE."""
+        toggle = reverse('posts:follow_toggle', args=[self.author.username])
+        response = self.authorized_user.post(toggle)
+        self.assertEqual(response.json(), {'following': True})
+        self.assertEqual(self.authorized_user.post(toggle).json(),
+                         {'following': True})
+        self.assertEqual(Follow.objects.count(), 1)
+        response = self.authorized_user.delete(toggle)
+        self.assertEqual(response.json(), {'following': False})
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(Client().post(toggle).status_code, 403)
+        self.assertEqual(self.authorized_user.get(toggle).status_code, 405)
+        own = reverse('posts:follow_toggle', args=[self.user.username])
+        self.assertEqual(self.authorized_user.post(own).json(),
+                         {'following': False})
+
+
+class FollowConcurrencyTests(TransactionTestCase):
+    THREADS = 8
+    ROUNDS = 20
+
+    def hammer(self, operation):
+        """Запускает operation одновременно из нескольких потоков."""
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(self.ROUNDS):
+                    while True:
+                        try:
+                            operation()
+                            break
+                        except OperationalError:
+                            # sqlite с общим кешем не ждёт блокировку
+                            # таблицы, а сразу сообщает о ней
+                            time.sleep(0.001)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker)
+                   for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def assert_counters_match(self, user, author):
+        rows = Follow.objects.filter(user=user, author=author).count()
+        self.assertLessEqual(rows, 1)
+        self.assertEqual(
+            Profile.objects.get(user=author).followers_count, rows)
+        self.assertEqual(
+            Profile.objects.get(user=user).following_count, rows)
+
+    def test_concurrent_follow_unfollow(self):
+        """Параллельные подписки и отписки одной пары не ломают счётчики."""
+        user = User.objects.create_user(username='follower')
+        author = User.objects.create_user(username='author')
+        self.hammer(lambda: follows.follow(user, author.pk))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assert_counters_match(user, author)
+        self.hammer(lambda: follows.unfollow(user, author.pk))
+        self.assertFalse(Follow.objects.exists())
+        self.assert_counters_match(user, author)
+
+        def toggle():
+            follows.follow(user, author.pk)
+            follows.unfollow(user, author.pk)
+
+        self.hammer(toggle)
+        self.assert_counters_match(user, author)
+
+
+class FollowButtonsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(3)
+        ]
+        for author in cls.authors + [cls.reader]:
+            Post.objects.create(author=author, text=f'Пост {author}')
+        Follow.objects.create(user=cls.reader, author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def follow_queries(self, context):
+        return [query for query in context.captured_queries
+                if 'posts_follow' in query['sql']]
+
+    def test_follow_buttons_in_feed(self):
+        """Кнопки подписки в ленте: одна выборка на все авторы."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(INDEX)
+        self.assertEqual(len(self.follow_queries(context)), 1)
+        for author in self.authors:
+            with self.subTest(author=author.username):
+                self.assertContains(
+                    response,
+                    reverse('posts:follow_toggle', args=[author]))
+        self.assertContains(response, 'data-following="true"', count=1)
+        self.assertContains(response, 'data-following="false"', count=2)
+        self.assertNotContains(
+            response, reverse('posts:follow_toggle', args=[self.reader]))
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(INDEX)
+        self.assertEqual(self.follow_queries(context), [])
+
+    def test_follow_state_refreshed(self):
+        """Подписка сбрасывает закешированное состояние кнопки."""
+        self.client.get(INDEX)
+        self.client.post(
+            reverse('posts:follow_toggle', args=[self.authors[1]]))
+        response = self.client.get(INDEX)
+        self.assertEqual(
+            response.content.decode().count('data-following="true"'), 2)
+
+    def test_anonymous_feed_has_no_buttons(self):
+        """Гостю кнопки не показываются и подписки не запрашиваются."""
+        self.client.logout()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(INDEX)
+        self.assertEqual(self.follow_queries(context), [])
+        self.assertNotContains(response, 'data-follow-toggle')
+
+
+class CursorPaginationViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cursor')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='cursor_slug',
+            description='Тестовое описание группы',
+        )
+        # bulk_create даёт записи с почти одинаковой датой,
+        # порядок между ними определяет id
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'text {i}', group=cls.group)
+            for i in range(NUMBER_OF_POSTS * 2 + 5)
+        )
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk')
+            .values_list('pk', flat=True)
+        )
+        cls.GROUP_LIST = reverse(
+            'posts:group_list', kwargs={'slug': cls.group.slug})
+        cls.PROFILE = reverse(
+            'posts:profile', kwargs={'username': cls.user.username})
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def walk(self, url, direction='after'):
+        """Проходит ленту по курсорам, возвращает id постов."""
+        seen = []
+        response = self.authorized_client.get(url + '?after=')
+        page = response.context['page_obj']
+        seen.extend(post.pk for post in page)
+        while page.has_next():
+            response = self.authorized_client.get(
+                url + f'?after={page.next_cursor}')
+            page = response.context['page_obj']
+            seen.extend(post.pk for post in page)
+        return seen, page
+
+    def test_cursor_walks_whole_feed(self):
+        """Курсорные страницы покрывают ленту без пропусков и повторов."""
+        for url in (INDEX, self.GROUP_LIST, self.PROFILE):
+            with self.subTest(url=url):
+                seen, _ = self.walk(url)
+                self.assertEqual(seen, self.expected)
+
+    def test_cursor_previous_page(self):
+        """Ссылка назад возвращает предыдущую страницу."""
+        first = self.authorized_client.get(INDEX + '?after=')
+        first_page = first.context['page_obj']
+        self.assertFalse(first_page.has_previous())
+        second = self.authorized_client.get(
+            INDEX + f'?after={first_page.next_cursor}')
+        second_page = second.context['page_obj']
+        third = self.authorized_client.get(
+            INDEX + f'?after={second_page.next_cursor}')
+        back = self.authorized_client.get(
+            INDEX + f'?before={third.context["page_obj"].previous_cursor}')
+        self.assertEqual(
+            [post.pk for post in back.context['page_obj']],
+            [post.pk for post in second_page],
+        )
+        self.assertContains(
+            second, f'?before={second_page.previous_cursor}')
+
+    def test_cursor_pages_do_not_count(self):
+        """Курсорная страница не выполняет COUNT(*) и OFFSET."""
+        _, page = self.walk(INDEX)
+        with self.assertNumQueries(1) as context:
+            page.paginator.get_page(after=page.previous_cursor)
+        sql = context.captured_queries[0]['sql'].upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный токен отдаёт первую страницу."""
+        response = self.authorized_client.get(INDEX + '?after=broken!')
+        page = response.context['page_obj']
+        self.assertEqual(
+            [post.pk for post in page], self.expected[:NUMBER_OF_POSTS])
+
+    @override_settings(POSTS_CURSOR_PAGINATION=True)
+    def test_cursor_mode_setting(self):
+        """Настройка включает курсорный режим без параметров в адресе."""
+        response = self.authorized_client.get(FOLLOW_INDEX)
+        self.assertTrue(response.context['page_obj'].is_cursor)
+
+
+class FeedQueryPlanTests(TestCase):
+    """Основные запросы лент обслуживаются индексами без сортировки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='plan_slug',
+            description='Тестовое описание группы',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, text='Текст', group=cls.group)
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def main_query(self, url, table):
+        """SQL выборки страницы: запрос к table с ORDER BY."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.get(url)
+        for query in context.captured_queries:
+            sql = query['sql']
+            if f'FROM "{table}"' in sql and 'ORDER BY' in sql:
+                return sql
+        self.fail(f'Запрос к {table} не найден для {url}')
+
+    def query_plan(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql)
+            else:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+    def assertUsesIndex(self, sql):
+        plan = self.query_plan(sql)
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan)
+            self.assertNotIn('Sort', plan)
+        else:
+            self.assertNotIn('TEMP B-TREE', plan)
+            self.assertRegex(plan, r'USING (COVERING )?INDEX')
+            for line in plan.splitlines():
+                if line.startswith('SCAN') and 'USING' not in line:
+                    self.fail(f'Полный просмотр таблицы: {line}')
+
+    def test_feed_queries_use_indexes(self):
+        """Выборки index, group_list, profile, follow_index, post_detail."""
+        urls = (
+            (INDEX, 'posts_post'),
+            (INDEX + '?after=', 'posts_post'),
+            (reverse('posts:group_list', args=[self.group.slug]),
+             'posts_post'),
+            (reverse('posts:profile', args=[self.author.username]),
+             'posts_post'),
+            (FOLLOW_INDEX, 'posts_post'),
+            (FOLLOW_INDEX + '?after=', 'posts_post'),
+            (reverse('posts:post_detail', args=[self.post.pk]),
+             'posts_comment'),
+        )
+        for url, table in urls:
+            with self.subTest(url=url):
+                self.assertUsesIndex(self.main_query(url, table))
+
+    def test_follow_lookup_uses_index(self):
+        """Поиск подписок читателя начинается с user."""
+        sql = str(
+            Follow.objects.filter(user=self.user).values('author').query)
+        self.assertUsesIndex(sql)
+
+
+# Следующая страница готовится в фоне, а на базе в памяти - в потоке
+# запроса; её выборка в бюджет страницы не входит
+@override_settings(PREFETCH_SECONDS=0)
+class QueryBudgetTests(TestCase):
+    """Число запросов страницы не зависит от количества записей.
+
+    Бюджет - запросы при одной записи на странице; при полной странице
+    и сотне комментариев их должно быть столько же. Рост означает N+1
+    в представлении или шаблоне.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='budget_slug',
+            description='Тестовое описание группы',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, text='Текст', group=cls.group)
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Комментарий')
+        cls.urls = (
+            INDEX,
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.author.username]),
+            FOLLOW_INDEX,
+            reverse('posts:post_detail', args=[cls.post.pk]),
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.get(url)
+        return len(context)
+
+    def fill_page(self):
+        """Доводит ленты до полной страницы с разными группами
+           и комментариями разных пользователей."""
+        for i in range(NUMBER_OF_POSTS * 2):
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'group_{i}', description='-')
+            Post.objects.create(author=self.author, text=f'Текст {i}',
+                                group=group if i % 2 else self.group)
+            commenter = User.objects.create_user(username=f'user_{i}')
+            for _ in range(5):
+                Comment.objects.create(
+                    post=self.post, author=commenter, text='Комментарий')
+
+    def test_views_query_count_is_constant(self):
+        """Запросы лент и страницы поста не растут с числом записей."""
+        budgets = {url: self.count_queries(url) for url in self.urls}
+        self.fill_page()
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertNumQueries(budget):
+                    self.authorized_client.get(url)
+
+
+class PaginatorLinksTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+
+    def add_posts(self, number):
+        Post.objects.bulk_create(
+            Post(author=self.user, text='Тестовый пост')
+            for _ in range(number))
+
+    def test_elided_page_range(self):
+        paginator = CountedPaginator(range(1000), NUMBER_OF_POSTS)
+        ellipsis = paginator.ELLIPSIS
+        cases = (
+            (1, [1, 2, 3, ellipsis, 100]),
+            (50, [1, ellipsis, 48, 49, 50, 51, 52, ellipsis, 100]),
+            (100, [1, ellipsis, 98, 99, 100]),
+        )
+        for number, expected in cases:
+            with self.subTest(number=number):
+                self.assertEqual(list(paginator.get_elided_page_range(
+                    number, on_each_side=2, on_ends=1)), expected)
+        paginator = CountedPaginator(range(50), NUMBER_OF_POSTS)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(3)), [1, 2, 3, 4, 5])
+
+    # bulk_create не меняет версии лент, готовая страница устарела бы
+    @override_settings(PAGE_CACHE_SECONDS=0)
+    def test_response_size_bounded(self):
+        """Размер страницы ленты не растёт с числом страниц."""
+        self.add_posts(NUMBER_OF_POSTS * 5)
+        small = self.client.get(INDEX + '?page=3')
+        self.add_posts(NUMBER_OF_POSTS * 500)
+        large = self.client.get(INDEX + '?page=3')
+        self.assertContains(large, CountedPaginator.ELLIPSIS)
+        self.assertContains(large, '?page=505')
+        self.assertLess(len(large.content) - len(small.content), 500)
+
+
+@override_settings(COUNT_EXACT_LIMIT=5, PAGE_CACHE_SECONDS=0)
+class EstimatedCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        cache.clear()
+
+    def add_posts(self, number):
+        Post.objects.bulk_create(
+            Post(author=self.user, text='Тестовый пост')
+            for _ in range(number))
+
+    def count_index(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(INDEX)
+        counts = [query['sql'] for query in context
+                  if 'COUNT(' in query['sql']]
+        return response.context['page_obj'].paginator.count, counts
+
+    def test_short_feed_counted_exactly(self):
+        self.add_posts(3)
+        self.assertEqual(self.count_index()[0], 3)
+        self.add_posts(1)
+        self.assertEqual(self.count_index()[0], 4)
+
+    def test_long_feed_count_cached(self):
+        """Длинная лента не считается целиком на каждый запрос."""
+        self.add_posts(8)
+        self.assertEqual(self.count_index()[0], 8)
+        self.add_posts(2)
+        count, queries = self.count_index()
+        self.assertEqual(count, 8)
+        self.assertEqual(queries, [])
+        with override_settings(COUNT_REFRESH_SECONDS=-1):
+            self.count_index()
+        self.assertEqual(self.count_index()[0], 10)
+
+    def test_table_statistics(self):
+        self.add_posts(8)
+        self.assertIsNone(table_statistics(Post, 'default'))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(table_statistics(Post, 'default'), 8)
+
+
+@override_settings(PAGE_CACHE_SECONDS=0)
+class PrefetchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='writer')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(NUMBER_OF_POSTS * 3):
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+
+    def setUp(self):
+        caches['fragments'].clear()
+        metrics.reset()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def page_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.authorized_client.get(url)
+        return response, [
+            query['sql'] for query in context
+            if 'FROM "posts_post"' in query['sql']
+            and 'COUNT(' not in query['sql']
+        ]
+
+    def test_next_page_prefetched(self):
+        """Следующая страница берётся из подготовленных заранее."""
+        for url in (INDEX, FOLLOW_INDEX):
+            with self.subTest(url=url):
+                first, _ = self.page_queries(url)
+                self.assertContains(first, 'rel="prefetch"')
+                second, queries = self.page_queries(url + '?page=2')
+                # Посты второй страницы выбираются по id, со смещением
+                # выбирается только третья
+                self.assertEqual(len(queries), 2)
+                self.assertNotIn('OFFSET', queries[0])
+                self.assertIn('OFFSET 20', queries[1])
+                self.assertEqual(
+                    [post.text for post in second.context['page_obj']],
+                    [f'Пост {i}' for i in range(19, 9, -1)])
+        with override_settings(METRICS_ALLOWED_IPS=['127.0.0.1']):
+            body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('yatube_prefetch_hits_total{view="posts:index"} 1',
+                      body)
+
+    def test_cursor_page_prefetched(self):
+        with override_settings(POSTS_CURSOR_PAGINATION=True):
+            first, _ = self.page_queries(INDEX)
+            url = INDEX + '?after=' + first.context['page_obj'].next_cursor
+            second, queries = self.page_queries(url)
+        # Посты второй страницы по id и выборка третьей
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(second.context['page_obj'][0].text, 'Пост 19')
+
+    def test_new_post_discards_prefetched_page(self):
+        self.authorized_client.get(INDEX)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.authorized_client.get(INDEX + '?page=2')
+        self.assertEqual(response.context['page_obj'][0].text, 'Пост 20')
+
+    def test_renamed_author_on_prefetched_page(self):
+        """Подготовленная страница показывает новое имя автора."""
+        for url in (INDEX, FOLLOW_INDEX):
+            with self.subTest(url=url):
+                self.authorized_client.get(url)
+                self.author.first_name = f'Имя для {url}'
+                self.author.save()
+                response = self.authorized_client.get(url + '?page=2')
+                self.assertEqual(
+                    response.context['page_obj'][0].author.first_name,
+                    f'Имя для {url}')
+                self.assertContains(response, f'Имя для {url}')
+
+    def test_unfollow_discards_follow_page(self):
+        """После отписки подготовленная страница ленты не отдаётся."""
+        self.authorized_client.get(FOLLOW_INDEX)
+        follows.unfollow(self.user, self.author.pk)
+        response = self.authorized_client.get(FOLLOW_INDEX + '?page=2')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_new_post_discards_follow_page(self):
+        for limit in (1000, 0):
+            with self.subTest(fanout_limit=limit), override_settings(
+                    TIMELINE_FANOUT_LIMIT=limit):
+                caches['fragments'].clear()
+                self.authorized_client.get(FOLLOW_INDEX)
+                post = Post.objects.create(
+                    author=self.author, text='Новый пост')
+                response = self.authorized_client.get(
+                    FOLLOW_INDEX + '?page=2')
+                self.assertEqual(
+                    response.context['page_obj'][0].text, 'Пост 20')
+                post.delete()
+
+    def test_browser_prefetch_does_not_chain(self):
+        self.authorized_client.get(INDEX, HTTP_SEC_PURPOSE='prefetch')
+        _, queries = self.page_queries(INDEX + '?page=2')
+        self.assertTrue(any('OFFSET 10' in sql for sql in queries))
+
+
+@override_settings(PAGE_CACHE_SECONDS=0)
+class FeedFragmentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug')
+        for i in range(NUMBER_OF_POSTS * 2 + 5):
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}')
+        follows.follow(cls.user, cls.author.pk)
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk')
+            .values_list('pk', flat=True)
+        )
+        cls.feeds = (
+            (INDEX, reverse('posts:index_feed')),
+            (reverse('posts:group_list', args=[cls.group.slug]),
+             reverse('posts:group_feed', args=[cls.group.slug])),
+            (reverse('posts:profile', args=[cls.author.username]),
+             reverse('posts:profile_feed', args=[cls.author.username])),
+            (FOLLOW_INDEX, reverse('posts:follow_feed')),
+        )
+
+    def setUp(self):
+        caches['fragments'].clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_fragments_continue_page(self):
+        """Фрагменты продолжают ленту с последнего поста страницы."""
+        for page_url, feed_url in self.feeds:
+            with self.subTest(feed=feed_url):
+                response = self.authorized_client.get(page_url)
+                seen = [post.pk for post in response.context['page_obj']]
+                cursor = response.context['feed_next']
+                self.assertContains(
+                    response, f'data-feed-more="{feed_url}?after={cursor}"')
+                while cursor:
+                    response = self.authorized_client.get(
+                        feed_url, {'after': cursor})
+                    self.assertTemplateUsed(
+                        response, 'includes/feed_page.html')
+                    self.assertNotContains(response, '<html')
+                    seen.extend(
+                        post.pk for post in response.context['page_obj'])
+                    cursor = response.context['feed_next']
+                self.assertNotContains(response, 'data-feed-more')
+                self.assertEqual(seen, self.expected)
+
+    def test_fragment_follow_buttons(self):
+        """Кнопки подписки - во фрагментах тех лент, где они на странице."""
+        toggle = reverse('posts:follow_toggle', args=[self.author.username])
+        buttons = (NUMBER_OF_POSTS, NUMBER_OF_POSTS, 0, 0)
+        for (_, feed_url), expected in zip(self.feeds, buttons):
+            with self.subTest(feed=feed_url):
+                response = self.authorized_client.get(feed_url)
+                self.assertContains(response, toggle, count=expected)
+
+    def test_json_feed(self):
+        url = reverse('posts:index_feed')
+        data = self.authorized_client.get(url, {'format': 'json'}).json()
+        self.assertEqual(
+            [post['id'] for post in data['posts']],
+            self.expected[:NUMBER_OF_POSTS])
+        post = data['posts'][0]
+        self.assertEqual(post['author'], self.author.username)
+        self.assertEqual(post['group'], self.group.slug)
+        self.assertEqual(post['url'], reverse(
+            'posts:post_detail', args=[post['id']]))
+        data = self.authorized_client.get(
+            url, {'format': 'json', 'after': data['next']}).json()
+        self.assertEqual(
+            [post['id'] for post in data['posts']],
+            self.expected[NUMBER_OF_POSTS:NUMBER_OF_POSTS * 2])
+
+    def test_fragment_not_modified(self):
+        url = reverse('posts:group_feed', args=[self.group.slug])
+        response = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_missing_feeds(self):
+        for url in (reverse('posts:group_feed', args=['missing']),
+                    reverse('posts:profile_feed', args=['missing'])):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.get(reverse('posts:follow_feed'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
@@ -0,0 +1,146 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import metrics
+
+from .conditional import bump_post_pages
+from .models import Post
+
+# Миниатюры готовятся заранее в фоновых потоках, а шаблоны только
+# спрашивают хранилище ключей sorl, готова ли миниатюра, и до тех пор
+# показывают заглушку. Отрисовка страницы не декодирует картинки.
+
+logger = logging.getLogger(__name__)
+
+# Все размеры, которые используют шаблоны
+THUMBNAIL_GEOMETRIES = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+class PreparedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, умеющий найти миниатюру без её создания."""
+
+    def prepare_options(self, source, options):
+        # Те же умолчания, что в ThumbnailBackend.get_thumbnail,
+        # иначе имя файла миниатюры не совпадёт
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None, если её ещё нет."""
+        source = ImageFile(file_)
+        options = self.prepare_options(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = PreparedThumbnailBackend()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def run_async():
+    # Потоки не могут ждать блокировку базы sqlite в памяти (тесты):
+    # общий кеш сразу отвечает "table is locked", поэтому там
+    # миниатюры создаются в потоке запроса
+    in_memory = getattr(connection, 'is_in_memory_db', lambda: False)()
+    return settings.THUMBNAIL_ASYNC and not in_memory
+
+
+def generate(post_id, name, geometry_string, options, in_thread=False):
+    """Создаёт миниатюру и обновляет версии карточки и лент поста."""
+    started = time.perf_counter()
+    try:
+        default.backend.get_thumbnail(name, geometry_string, **options)
+        post = Post.objects.filter(pk=post_id).values_list(
+            'author_id', 'group_id').first()
+        if post is not None:
+            bump_post_pages(post_id, *post)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+    finally:
+        elapsed = time.perf_counter() - started
+        if metrics.current() is not None:
+            metrics.add('thumbnail_seconds', elapsed)
+        else:
+            metrics.record_background('thumbnail_seconds', elapsed)
+        with _pending_lock:
+            _pending.discard((name, geometry_string))
+        if in_thread:
+            # Соединения с базой у потоков свои, закрываем после задачи
+            connection.close()
+
+
+def enqueue(post_id, name, geometry_string, options):
+    key = (name, geometry_string)
+    with _pending_lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+    if run_async():
+        get_executor().submit(
+            generate, post_id, name, geometry_string, options, True)
+    else:
+        generate(post_id, name, geometry_string, options)
+
+
+def schedule_thumbnails(post):
+    """Ставит в очередь все миниатюры картинки поста после коммита."""
+    if not post.image:
+        return
+    name = post.image.name
+    for geometry_string, options in THUMBNAIL_GEOMETRIES:
+        transaction.on_commit(
+            lambda geometry_string=geometry_string, options=options:
+            enqueue(post.pk, name, geometry_string, options)
+        )
+
+
+def ready_thumbnail(post, geometry_string, **options):
+    """Миниатюра картинки поста, если она уже создана.
+
+    Отсутствующая миниатюра ставится в очередь, а шаблон
+    показывает заглушку.
+    """
+    if not post.image:
+        return None
+    thumbnail = backend.get_ready_thumbnail(
+        post.image, geometry_string, **options)
+    if thumbnail is None:
+        name = post.image.name
+        transaction.on_commit(
+            lambda: enqueue(post.pk, name, geometry_string, options))
+    return thumbnail
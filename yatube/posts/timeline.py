@@ -0,0 +1,225 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+
+from .conditional import feed_scope
+from .models import Follow, Post, TimelineEntry
+from .versions import bump_many
+
+# Лента подписок хранится материализованной: при публикации пост
+# раскладывается по лентам подписчиков (fan-out on write). Для авторов
+# с очень большим числом подписчиков раскладка не делается, их посты
+# подмешиваются в ленту при чтении (fan-out on read).
+# Изменение записей ленты читателя меняет её версию ('feed',
+# 'timeline:<id>'), по которой сверяются заранее подготовленные
+# страницы (posts.prefetch).
+
+FANOUT_BATCH_SIZE = 500
+# Читателей в одном INSERT ... SELECT при массовой пересборке
+REBUILD_BATCH_SIZE = 500
+
+
+def timeline_key(user_id):
+    """Ключ ленты подписок читателя в posts.prefetch и posts.versions."""
+    return f'timeline:{user_id}'
+
+
+def bump_timelines(user_ids):
+    bump_many(('feed', timeline_key(user_id)) for user_id in user_ids)
+
+
+def timeline_scopes(user_id, popular):
+    """Версии, от которых зависит лента: своя и лент популярных авторов."""
+    return [
+        ('feed', timeline_key(user_id)),
+        *(feed_scope('author', author_id) for author_id in popular),
+    ]
+
+
+def follower_ids(author_id):
+    """Id подписчиков автора или None, если их больше лимита раскладки."""
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    ids = list(
+        Follow.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True)[:limit + 1]
+    )
+    if len(ids) > limit:
+        return None
+    return ids
+
+
+def popular_author_ids(user):
+    """Авторы из подписок читателя, чьи посты не раскладываются."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__profile__followers_count__gt=(
+                settings.TIMELINE_FANOUT_LIMIT),
+        ).values_list('author_id', flat=True)
+    )
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    ids = follower_ids(post.author_id)
+    if not ids:
+        return
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in ids
+        ),
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    bump_timelines(ids)
+
+
+def backfill(user_id, author_id):
+    """Переносит последние посты автора в ленту нового подписчика."""
+    if follower_ids(author_id) is None:
+        return
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_MAX_LENGTH]
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts
+        ),
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim(user_id)
+
+
+def restore_author(author_id):
+    """Раскладывает посты автора, вернувшегося под лимит раскладки.
+
+    Пока подписчиков было больше TIMELINE_FANOUT_LIMIT, посты автора
+    не раскладывались, а подмешивались при чтении. Вызывается после
+    отписки: если подписчиков стало ровно столько, сколько позволяет
+    лимит, последние посты автора добавляются во все их ленты.
+    """
+    ids = follower_ids(author_id)
+    if not ids or len(ids) != settings.TIMELINE_FANOUT_LIMIT:
+        return
+    posts = list(
+        Post.objects.filter(author_id=author_id)
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_MAX_LENGTH]
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for user_id in ids
+            for post_id, pub_date in posts
+        ),
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    for user_id in ids:
+        trim(user_id)
+    bump_timelines(ids)
+
+
+def remove_author(user_id, author_id):
+    """Убирает посты автора из ленты читателя после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def trim(user_id):
+    """Обрезает ленту читателя до TIMELINE_MAX_LENGTH записей.
+
+    Удаляются записи после первых TIMELINE_MAX_LENGTH в порядке
+    (-pub_date, -pk), так что посты с той же датой, что и последний
+    оставшийся, из ленты не пропадают.
+    """
+    extra = (
+        TimelineEntry.objects.filter(user_id=user_id)
+        .order_by('-pub_date', '-pk')
+        .values('pk')[settings.TIMELINE_MAX_LENGTH:]
+    )
+    TimelineEntry.objects.filter(pk__in=extra).delete()
+
+
+def rebuild(user_id):
+    """Пересобирает ленту читателя по текущим подпискам."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    authors = Follow.objects.filter(user_id=user_id).values_list(
+        'author_id', flat=True)
+    for author_id in authors:
+        backfill(user_id, author_id)
+    bump_timelines([user_id])
+
+
+def rebuild_many(user_ids):
+    """Пересобирает ленты многих читателей (после массовой загрузки).
+
+    Записи вставляются одним INSERT ... SELECT на порцию читателей
+    без выборки постов в Python, затем ленты обрезаются до лимита.
+    """
+    user_ids = list(user_ids)
+    table = connection.ops.quote_name(TimelineEntry._meta.db_table)
+    columns = ', '.join(
+        connection.ops.quote_name(TimelineEntry._meta.get_field(name).column)
+        for name in ('user', 'post', 'author', 'pub_date')
+    )
+    for start in range(0, len(user_ids), REBUILD_BATCH_SIZE):
+        batch = user_ids[start:start + REBUILD_BATCH_SIZE]
+        TimelineEntry.objects.filter(user_id__in=batch).delete()
+        entries = (
+            Follow.objects.filter(
+                user_id__in=batch, author__posts__isnull=False)
+            .exclude(author__profile__followers_count__gt=(
+                settings.TIMELINE_FANOUT_LIMIT))
+            .values_list(
+                'user_id', 'author__posts__id', 'author_id',
+                'author__posts__pub_date')
+            .order_by()
+        )
+        sql, params = entries.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) {sql}', params)
+        for user_id in batch:
+            trim(user_id)
+        bump_timelines(batch)
+
+
+def timeline_posts(user, popular=None):
+    """Посты ленты подписок читателя.
+
+    Обычный случай - чтение диапазона по индексу записей ленты;
+    посты популярных авторов добавляются условием по author_id.
+    Ключ сортировки ленты доступен как feed_date и feed_post.
+    popular - уже выбранные popular_author_ids(user).
+    """
+    if popular is None:
+        popular = popular_author_ids(user)
+    if not popular:
+        posts = Post.objects.filter(timeline_entries__user=user).annotate(
+            feed_date=F('timeline_entries__pub_date'),
+            feed_post=F('timeline_entries__post_id'),
+        )
+    else:
+        entries = TimelineEntry.objects.filter(user=user).values('post_id')
+        posts = Post.objects.filter(
+            Q(pk__in=entries) | Q(author_id__in=popular)
+        ).annotate(feed_date=F('pub_date'), feed_post=F('pk'))
+    return posts.order_by('-feed_date', '-feed_post')
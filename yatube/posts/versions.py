@@ -0,0 +1,44 @@
+from uuid import uuid4
+
+from django.core.cache import caches
+
+# Версии объектов для ключей кеша. Вместо удаления закешированных
+# фрагментов при записи меняется версия объекта, и старые ключи просто
+# перестают запрашиваться. Версия - случайный токен, поэтому вытесненная
+# из кеша версия не совпадёт ни с одним ранее выданным ключом.
+
+
+VERSIONS_CACHE = 'fragments'
+
+
+def version_key(scope, pk):
+    return f'version:{scope}:{pk}'
+
+
+def get_versions(pairs):
+    """Версии для пар (scope, pk) одним обращением к кешу."""
+    keys = {pair: version_key(*pair) for pair in pairs}
+    cache = caches[VERSIONS_CACHE]
+    found = cache.get_many(keys.values())
+    missing = [key for key in keys.values() if key not in found]
+    if missing:
+        # add() не перезаписывает версию, которую успел создать
+        # другой процесс, поэтому все процессы сходятся на одной
+        for key in missing:
+            cache.add(key, uuid4().hex, timeout=None)
+        found.update(cache.get_many(missing))
+        for key in missing:
+            found.setdefault(key, uuid4().hex)
+    return {pair: found[key] for pair, key in keys.items()}
+
+
+def bump(scope, pk):
+    """Делает недействительными все ключи с версией объекта."""
+    caches[VERSIONS_CACHE].set(
+        version_key(scope, pk), uuid4().hex, timeout=None)
+
+
+def bump_many(pairs):
+    """bump для многих пар (scope, pk) одним обращением к кешу."""
+    caches[VERSIONS_CACHE].set_many(
+        {version_key(*pair): uuid4().hex for pair in pairs}, timeout=None)
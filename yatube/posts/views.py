@@ -1,63 +1,224 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods
 
+from . import follows, prefetch
+from .conditional import (conditional_page, group_etag, index_etag,
+                          post_etag, profile_etag)
+from .counters import get_profile
+from .estimates import capped_count
+from .exports import CONTENT_TYPES, FORMATS, export_lines
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Comment, Group, Post, User
+from .pagination import CountedPaginator, CursorPaginator, encode_cursor
+from .search import search_posts
+from .thumbnails import schedule_thumbnails
+from .timeline import (popular_author_ids, timeline_key, timeline_posts,
+                       timeline_scopes)
 
 # Выборка постов в представлениях
 # предварительно отсотрирована в порядке убывания по дате
 # в классе Meta модели записи блога (Post)
 
 NUMBER_OF_POSTS = 10
+NUMBER_OF_COMMENTS = 20
 
 
-def page_object(queryset, request):
-    paginator = Paginator(queryset, NUMBER_OF_POSTS)
+def page_object(queryset, request, ordering_field='pub_date',
+                tiebreaker='pk', count=None, feed_key=None,
+                feed_scopes=None):
+    # Курсорный режим включается настройкой POSTS_CURSOR_PAGINATION
+    # или наличием токена ?after=/?before= в адресе страницы.
+    # feed_key - ключ ленты для приблизительного числа записей
+    # (posts.estimates) и заранее подготовленных страниц (posts.prefetch),
+    # feed_scopes - версии, от которых зависят подготовленные страницы
+    cursor_mode = (
+        settings.POSTS_CURSOR_PAGINATION
+        or 'after' in request.GET
+        or 'before' in request.GET
+    )
+    if cursor_mode:
+        paginator = CursorPaginator(
+            queryset, NUMBER_OF_POSTS, ordering_field, tiebreaker)
+        position = request.GET.get('after')
+        if feed_key and 'before' not in request.GET:
+            page_obj = prefetch.take_page(
+                paginator, feed_key, position, feed_scopes)
+            if page_obj is not None:
+                return page_obj
+        return paginator.get_page(
+            after=position,
+            before=request.GET.get('before'),
+        )
+    paginator = CountedPaginator(
+        queryset, NUMBER_OF_POSTS, count=count, count_key=feed_key)
     page_number = request.GET.get('page')
+    if feed_key:
+        page_obj = prefetch.take_page(
+            paginator, feed_key, page_number, feed_scopes)
+        if page_obj is not None:
+            return page_obj
     page_obj = paginator.get_page(page_number)
     return page_obj
 
 
+def feed_cursor(page_obj, ordering_field='pub_date', tiebreaker='pk'):
+    # Курсор, с которого лента подгружается фрагментом после страницы:
+    # у нумерованной страницы он строится по последнему посту
+    if not page_obj.has_next():
+        return None
+    if getattr(page_obj, 'is_cursor', False):
+        return page_obj.next_cursor
+    last = page_obj[len(page_obj) - 1]
+    return encode_cursor(
+        getattr(last, ordering_field), getattr(last, tiebreaker))
+
+
+def feed_fragment(request, posts, feed_url, ordering_field='pub_date',
+                  tiebreaker='pk', feed_key=None, feed_scopes=None,
+                  follow_buttons=False):
+    # Порция ленты для бесконечной прокрутки: только карточки постов
+    # (или их поля в JSON) и курсор следующей порции. follow_buttons -
+    # кнопки подписки под карточками, как на полной странице ленты
+    paginator = CursorPaginator(
+        posts, NUMBER_OF_POSTS, ordering_field, tiebreaker)
+    position = request.GET.get('after')
+    page_obj = None
+    if feed_key:
+        page_obj = prefetch.take_page(
+            paginator, feed_key, position, feed_scopes)
+    if page_obj is None:
+        page_obj = paginator.get_page(after=position)
+    if request.GET.get('format') == 'json':
+        response = JsonResponse({
+            'posts': [
+                {
+                    'id': post.id,
+                    'author': post.author.username,
+                    'group': post.group.slug if post.group else None,
+                    'text': post.text,
+                    'pub_date': post.pub_date,
+                    'image': post.image.url if post.image else None,
+                    'comments_count': post.comments_count,
+                    'url': reverse('posts:post_detail', args=[post.id]),
+                }
+                for post in page_obj
+            ],
+            'next': page_obj.next_cursor,
+        }, json_dumps_params={'ensure_ascii': False})
+    else:
+        context = {
+            'page_obj': page_obj,
+            'feed_url': feed_url,
+            'feed_next': page_obj.next_cursor,
+            'follow_buttons': follow_buttons,
+        }
+        response = render(request, 'includes/feed_page.html', context)
+    if feed_key:
+        prefetch.schedule_next(request, page_obj, feed_key, feed_scopes)
+    return response
+
+
+@conditional_page(index_etag)
 def index(request):
     posts = Post.objects.select_related('author', 'group')
-    page_obj = page_object(posts, request)
+    page_obj = page_object(posts, request, feed_key='index')
     context = {
         'page_obj': page_obj,
+        'feed_url': reverse('posts:index_feed'),
+        'feed_next': feed_cursor(page_obj),
     }
-    return render(request, 'posts/index.html', context)
+    response = render(request, 'posts/index.html', context)
+    prefetch.schedule_next(request, page_obj, 'index')
+    return response
 
 
+@conditional_page(group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.select_related('author')
-    page_obj = page_object(posts, request)
+    page_obj = page_object(posts, request, count=group.posts_count)
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_url': reverse('posts:group_feed', args=[slug]),
+        'feed_next': feed_cursor(page_obj),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(index_etag)
+def index_feed(request):
+    posts = Post.objects.select_related('author', 'group')
+    return feed_fragment(
+        request, posts, reverse('posts:index_feed'), feed_key='index',
+        follow_buttons=True)
+
+
+@conditional_page(group_etag)
+def group_feed(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_fragment(
+        request, group.posts.select_related('author', 'group'),
+        reverse('posts:group_feed', args=[slug]), follow_buttons=True)
+
+
+@conditional_page(profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = page_object(posts, request)
-    following = False
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author).exists()
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username)
+    posts = author.posts.select_related('group')
+    page_obj = page_object(
+        posts, request, count=get_profile(author).posts_count)
+    following = author.pk in follows.followed_authors(request, {author.pk})
     context = {
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        'feed_url': reverse('posts:profile_feed', args=[username]),
+        'feed_next': feed_cursor(page_obj),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@conditional_page(profile_etag)
+def profile_feed(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_fragment(
+        request, author.posts.select_related('author', 'group'),
+        reverse('posts:profile_feed', args=[username]))
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    posts = search_posts(query).select_related('author', 'group')
+    # Результаты упорядочены по релевантности, курсор по дате к ним
+    # неприменим - только нумерованные страницы. Запросов слишком
+    # много, чтобы хранить и обновлять подсчёт каждого: считается не
+    # больше COUNT_EXACT_LIMIT + 1 результатов, дальше страниц нет
+    paginator = CountedPaginator(
+        posts, NUMBER_OF_POSTS, count=capped_count(posts))
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'extra_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@conditional_page(post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__profile', 'group'), id=post_id)
+    comments = comment_page(post.pk, request.GET.get('comments_after'))
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
@@ -67,7 +228,74 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def comment_page(post_id, after=None):
+    # Комментарии отдаются порциями от новых к старым,
+    # следующая порция - по курсору created последнего комментария
+    comments = (Comment.objects.select_related('author')
+                .filter(post_id=post_id))
+    paginator = CursorPaginator(comments, NUMBER_OF_COMMENTS, 'created')
+    return paginator.get_page(after=after)
+
+
+def post_comments(request, post_id):
+    comments = comment_page(post_id, request.GET.get('after'))
+    if not comments and not Post.objects.filter(id=post_id).exists():
+        raise Http404
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created,
+                }
+                for comment in comments
+            ],
+            'next': comments.next_cursor,
+        })
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
+def export_response(request, posts, name):
+    # Архив отдаётся потоком: строки формируются по мере чтения
+    # постов и комментариев из базы
+    export_format = request.GET.get('format', 'jsonl')
+    if export_format not in FORMATS:
+        raise Http404
+    response = StreamingHttpResponse(
+        export_lines(posts, export_format),
+        content_type=CONTENT_TYPES[export_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}.{export_format}"')
+    return response
+
+
+@login_required
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        raise PermissionDenied
+    return export_response(
+        request, Post.objects.filter(author=author), username)
+
+
 @login_required
+def group_export(request, slug):
+    if not request.user.is_staff:
+        raise PermissionDenied
+    group = get_object_or_404(Group, slug=slug)
+    return export_response(
+        request, Post.objects.filter(group=group), slug)
+
+
+@login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -77,6 +305,7 @@ def post_create(request):
         new_post = form.save(commit=False)
         new_post.author = request.user
         new_post.save()
+        schedule_thumbnails(new_post)
         return redirect('posts:profile', request.user.username)
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -93,7 +322,7 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        schedule_thumbnails(form.save())
         return redirect('posts:post_detail', post_id)
     context = {
         'is_edit': is_edit,
@@ -103,6 +332,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -116,30 +346,63 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    user = request.user
-    posts = (Post.objects.select_related('author')
-             .filter(author__following__user=user))
-    page_obj = page_object(posts, request)
+    popular = popular_author_ids(request.user)
+    posts = timeline_posts(request.user, popular).select_related(
+        'author', 'group')
+    feed_key = timeline_key(request.user.pk)
+    scopes = timeline_scopes(request.user.pk, popular)
+    page_obj = page_object(
+        posts, request, 'feed_date', 'feed_post', feed_key=feed_key,
+        feed_scopes=scopes)
     context = {
         'page_obj': page_obj,
+        'feed_url': reverse('posts:follow_feed'),
+        'feed_next': feed_cursor(page_obj, 'feed_date', 'feed_post'),
     }
-    return render(request, 'posts/follow.html', context)
+    response = render(request, 'posts/follow.html', context)
+    prefetch.schedule_next(request, page_obj, feed_key, scopes)
+    return response
 
 
 @login_required
+def follow_feed(request):
+    popular = popular_author_ids(request.user)
+    posts = timeline_posts(request.user, popular).select_related(
+        'author', 'group')
+    return feed_fragment(
+        request, posts, reverse('posts:follow_feed'),
+        'feed_date', 'feed_post', feed_key=timeline_key(request.user.pk),
+        feed_scopes=timeline_scopes(request.user.pk, popular))
+
+
+@login_required
+@transaction.atomic
 def profile_follow(request, username):
-    user = request.user
-    author = User.objects.get(username=username)
-    follower = Follow.objects.filter(user=user, author=author)
-    if not (follower.exists() or author == user):
-        Follow.objects.create(user=user, author=author)
+    author = get_object_or_404(User, username=username)
+    follows.follow(request.user, author.pk)
     return redirect('posts:profile', username)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    follower = Follow.objects.filter(user=request.user, author=author)
-    if follower.exists():
-        follower.delete()
+    follows.unfollow(request.user, author.pk)
     return redirect('posts:profile', username)
+
+
+@require_http_methods(['POST', 'DELETE'])
+@transaction.atomic
+def follow_toggle(request, username):
+    # POST подписывает, DELETE отписывает; повтор запроса ничего
+    # не меняет, поэтому двойной клик безопасен
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Требуется вход'}, status=403)
+    author = get_object_or_404(User, username=username)
+    if request.method == 'POST':
+        follows.follow(request.user, author.pk)
+        following = author != request.user
+    else:
+        follows.unfollow(request.user, author.pk)
+        following = False
+    return JsonResponse({'following': following})
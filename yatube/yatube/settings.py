@@ -1,4 +1,5 @@
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -39,11 +40,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -53,7 +57,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.templates.InstrumentedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -74,13 +78,75 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# SQLite
+# Профиль соединений sqlite задаёт PRAGMA при открытии соединения
+# (бэкенд core.sqlite): wal - журнал WAL, в котором запись не блокирует
+# чтение, synchronous=NORMAL, отображение файла в память, кеш страниц
+# и ожидание блокировки; rollback - обычный журнал sqlite.
+# Соединения живут CONN_MAX_AGE секунд, так что PRAGMA и прогретый
+# кеш страниц переживают запрос. Транзакции начинаются с
+# BEGIN IMMEDIATE, чтобы запись ждала блокировку, а не падала
+SQLITE_PROFILES = {
+    'rollback': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+    },
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # в КиБ
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+}
+SQLITE_PROFILE = os.getenv('SQLITE_PROFILE', 'wal')
+SQLITE_TRANSACTION_MODE = os.getenv('SQLITE_TRANSACTION_MODE', 'IMMEDIATE')
+CONN_MAX_AGE = int(os.getenv('CONN_MAX_AGE', 60))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'OPTIONS': {
+            'transaction_mode': SQLITE_TRANSACTION_MODE,
+        },
+    },
+    # Реплика для чтения лент; без REPLICA_DATABASE - та же база
+    'replica': {
+        'ENGINE': 'core.sqlite',
+        'NAME': os.getenv(
+            'REPLICA_DATABASE', os.path.join(BASE_DIR, 'db.sqlite3')),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Представления только для чтения читают из реплики, если задана
+# REPLICA_DATABASE; после записи клиент REPLICA_STICKY_SECONDS секунд
+# читает из основной базы, чтобы сразу видеть свои изменения
+REPLICA_READS = bool(os.getenv('REPLICA_DATABASE'))
+REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:follow_index',
+    'posts:index_feed',
+    'posts:group_feed',
+    'posts:profile_feed',
+    'posts:follow_feed',
+    'posts:post_detail',
+    'posts:comments',
+    'posts:search',
+)
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -136,8 +202,151 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 # Caching
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Бэкенд кеша задаётся переменными окружения, чтобы воркеры gunicorn
+# делили один кеш: CACHE_BACKEND = file (по умолчанию) | redis |
+# memcached | locmem, CACHE_LOCATION - каталог для file или адрес
+# сервера для redis/memcached.
+# Именованные кеши: fragments - карточки постов и версии объектов,
+# sessions - сессии, thumbnails - ключи миниатюр sorl-thumbnail.
+# Версии объектов (posts.versions) должны быть общими для всех
+# процессов: с locmem правка сбрасывает кеш только в том воркере,
+# который её принял. locmem по умолчанию только у тестов, которым
+# нужен чистый кеш при каждом запуске.
+
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND', 'locmem' if TESTING else 'file')
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', '')
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django_redis.cache.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+}
+
+
+def cache_settings(alias):
+    if CACHE_BACKEND == 'file':
+        location = os.path.join(
+            CACHE_LOCATION or os.path.join(BASE_DIR, 'cache'), alias)
+    elif CACHE_BACKEND == 'locmem':
+        location = alias
+    else:
+        location = CACHE_LOCATION
+    return {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': location,
+        'KEY_PREFIX': alias,
+        'TIMEOUT': int(os.getenv('CACHE_TIMEOUT', 300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+        } if CACHE_BACKEND in ('locmem', 'file') else {},
     }
+
+
+CACHES = {
+    alias: cache_settings(alias)
+    for alias in ('default', 'fragments', 'pages', 'sessions', 'thumbnails')
+}
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+
+THUMBNAIL_CACHE = 'thumbnails'
+
+# Pagination
+# Курсорная пагинация лент (?after=<токен>) без COUNT(*) и OFFSET
+POSTS_CURSOR_PAGINATION = os.getenv(
+    'POSTS_CURSOR_PAGINATION', 'False') == 'True'
+
+# Approximate counts
+# Нумерованные ленты без готового счётчика (главная, подписки)
+# длиннее COUNT_EXACT_LIMIT записей нумеруются по точному подсчёту из
+# кеша, который обновляется в фоне раз в COUNT_REFRESH_SECONDS
+# (posts.estimates); COUNT(*) по всей ленте в запросе не выполняется.
+# Поиск показывает не больше COUNT_EXACT_LIMIT результатов
+COUNT_EXACT_LIMIT = int(os.getenv('COUNT_EXACT_LIMIT', 10000))
+COUNT_REFRESH_SECONDS = int(os.getenv('COUNT_REFRESH_SECONDS', 60))
+
+# Prefetch
+# После страницы главной ленты и ленты подписок следующая готовится
+# в фоне (posts.prefetch) и хранится PREFETCH_SECONDS секунд;
+# 0 отключает подготовку
+PREFETCH_SECONDS = int(os.getenv('PREFETCH_SECONDS', 60))
+PREFETCH_WORKERS = int(os.getenv('PREFETCH_WORKERS', 2))
+
+# Timeline
+# Лента подписок раскладывается по читателям при публикации поста;
+# посты авторов, у которых подписчиков больше лимита, читаются напрямую
+TIMELINE_FANOUT_LIMIT = int(os.getenv('TIMELINE_FANOUT_LIMIT', 1000))
+TIMELINE_MAX_LENGTH = int(os.getenv('TIMELINE_MAX_LENGTH', 1000))
+
+# Время жизни карточки поста в кеше; устаревание по правкам
+# обеспечивают версии объектов в ключе (posts.versions)
+POST_CARD_TIMEOUT = 60 * 60 * 24
+
+# Conditional GET
+# Ленты и страница поста отвечают 304 по ETag из версий показанных
+# объектов (posts.conditional). Анонимные страницы обратный прокси
+# хранит PUBLIC_CACHE_SECONDS секунд; PAGE_VERSION меняется при
+# выкладке новых шаблонов, чтобы сбросить ETag
+PUBLIC_CACHE_SECONDS = int(os.getenv('PUBLIC_CACHE_SECONDS', 10))
+PAGE_VERSION = os.getenv('PAGE_VERSION', '1')
+
+# Page cache
+# Готовые страницы этих представлений для посетителей без сессии
+# (core.middleware.AnonymousPageCacheMiddleware); ключ включает ETag,
+# так что устаревшие страницы не отдаются, а вытесняются по времени.
+# PAGE_CACHE_SECONDS=0 отключает кеш
+PAGE_CACHE = 'pages'
+PAGE_CACHE_SECONDS = int(os.getenv('PAGE_CACHE_SECONDS', 60 * 10))
+
+# Время жизни состояния подписки читателя на автора в кеше
+# (кнопки подписки в лентах); сбрасывается при подписке и отписке
+FOLLOW_STATE_TIMEOUT = 60
+
+# Thumbnails
+# Миниатюры создаются пулом потоков после сохранения поста;
+# THUMBNAIL_ASYNC=False создаёт их сразу в потоке запроса
+THUMBNAIL_ASYNC = os.getenv('THUMBNAIL_ASYNC', 'True') == 'True'
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+
+# Uploaded images
+# Загрузки больше FILE_UPLOAD_MAX_MEMORY_SIZE пишутся во временный файл,
+# картинка поста уменьшается до POST_IMAGE_MAX_SIZE по большей стороне
+# и пересохраняется в POST_IMAGE_FORMAT без метаданных
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2 * 1024 * 1024
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_MAX_SIZE = int(os.getenv('POST_IMAGE_MAX_SIZE', 1920))
+POST_IMAGE_FORMAT = os.getenv('POST_IMAGE_FORMAT', 'JPEG')
+POST_IMAGE_QUALITY = int(os.getenv('POST_IMAGE_QUALITY', 85))
+
+# Request metrics
+# Замеры запросов: заголовок Server-Timing, строка лога core.middleware
+# (уровень REQUEST_LOG_LEVEL) и итоги процесса на /metrics/ - для
+# сотрудников и адресов из METRICS_ALLOWED_IPS (по умолчанию никаких).
+# Строки всех запросов пишутся с уровнем INFO (REQUEST_LOG_LEVEL=INFO),
+# запросов дольше SLOW_REQUEST_MS миллисекунд - WARNING
+METRICS_ALLOWED_IPS = [
+    ip for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip]
+REQUEST_LOG_LEVEL = os.getenv('REQUEST_LOG_LEVEL', 'WARNING')
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.middleware': {
+            'handlers': ['console'],
+            'level': REQUEST_LOG_LEVEL,
+            'propagate': False,
+        },
+    },
 }